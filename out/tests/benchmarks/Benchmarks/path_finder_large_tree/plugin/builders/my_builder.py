@@ -0,0 +1 @@
+VALUE = 123
@@ -1,27 +1,55 @@
 import sys
 import traceback
-from typing import cast
+from argparse import Namespace
+from typing import TYPE_CHECKING, cast
 
-from nmk._internal.build import NmkBuild
-from nmk._internal.loader import NmkLoader
 from nmk._internal.parser import NmkParser
 from nmk.errors import NmkStopHereError
-from nmk.logs import NmkLogger, logging_shutdown
+
+if TYPE_CHECKING:
+    from nmk._internal.modelcache import NmkModelCache
 
 
 # CLI entry point
 def nmk(argv: list[str]) -> int:
     # Build parser and parse input args
     args = NmkParser().parse(argv)
+
+    # Daemon handling
+    if args.daemon or args.stop_daemon:
+        from nmk._internal.daemon import run_in_daemon, stop_daemon
+
+        if args.stop_daemon:
+            return stop_daemon(args)
+        out = run_in_daemon(args, argv)
+        if out is not None:
+            return out
+
+    # Build in this process
+    return run(args)
+
+
+# Load model and build (in current process)
+def run(args: Namespace, model_cache: "NmkModelCache | None" = None) -> int:
+    # Heavy modules are imported only now (not needed when only completing)
+    from nmk._internal.build import NmkBuild
+    from nmk._internal.loader import NmkLoader
+    from nmk._internal.profile import profile_span, start_profiling, stop_profiling
+    from nmk.logs import NmkLogger, logging_shutdown
+
     out = 0
     model = None
+    profiler = start_profiling() if args.profile else None
 
     try:
         # Load build model
-        model = NmkLoader(args).model
+        with profile_span("load", "phase"):
+            model = NmkLoader(args, model_cache=model_cache).model
 
         # Trigger build
-        if NmkBuild(model).build():
+        with profile_span("build", "phase"):
+            built = NmkBuild(model).build()
+        if built:
             NmkLogger.info("checkered_flag", "Done")
         else:
             NmkLogger.info("checkered_flag", "Nothing to do")
@@ -31,6 +59,16 @@ def nmk(argv: list[str]) -> int:
             list(map(NmkLogger.debug, "".join(traceback.format_tb(e.__traceback__)).split("\n")))
             out = 1
     finally:
+        # Profiling report
+        if profiler is not None:
+            stop_profiling()
+            NmkLogger.info("stopwatch", "Profiling summary:")
+            list(map(lambda line: NmkLogger.info("stopwatch", line), profiler.summary()))
+            if hasattr(args, "nmk_dir"):
+                trace_file = args.nmk_dir / "profile.json"
+                profiler.save_trace(trace_file)
+                NmkLogger.info("stopwatch", f"Profiling trace written to {trace_file}")
+
         # Flush all log handlers
         if model:
             logging_shutdown(args, {n: cast(str, v.value) for n, v in model.config.items() if v.is_final})
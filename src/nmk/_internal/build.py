@@ -1,7 +1,13 @@
 import json
 import logging
+import threading
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
 
+from nmk._internal.digests import NmkDigests
+from nmk._internal.profile import profile_count, profile_span
+from nmk._internal.stats import NmkStatCache
 from nmk.errors import NmkStopHereError
 from nmk.logs import NmkLogger, NmkLogWrapper
 from nmk.model.keys import NmkRootConfig
@@ -20,7 +26,12 @@ class NmkBuild:
     def __init__(self, model: NmkModel):
         self.model = model
         self.ordered_tasks = []
+        self._traversed: set[str] = set()
+        self.phases = []
         self.built_tasks = 0
+        self._built_lock = threading.Lock()
+        self.stats = NmkStatCache()
+        self.digests = NmkDigests(self.model.args.nmk_dir / "digests.json") if self.model.args.digests else None
 
         # Find root tasks
         if len(self.model.args.tasks):
@@ -35,24 +46,44 @@ class NmkBuild:
             # Nothing to do
             root_tasks = []
 
-        # Handle prologue/epilogue
-        root_tasks = [self.model.tasks["prologue"]] + root_tasks + [self.model.tasks["epilogue"]]
-
-        # Prepare build order
-        for root_task in root_tasks:
-            self._traverse_task(root_task, [])
-
-    def _traverse_task(self, task: NmkTask, refering_tasks: list[NmkTask]):
-        # Cyclic dependency?
-        assert task not in refering_tasks, f"Cyclic dependency: {task.name} referenced from tasks {' -> '.join(t.name for t in refering_tasks)}"
-
-        # Traverse dependencies
-        for dep in task.subtasks:
-            self._traverse_task(dep, refering_tasks + [task])
-
-        # Add task if not already done
-        if task not in self.ordered_tasks:
-            self.ordered_tasks.append(task)
+        # Prepare build order, by phases: prologue, then required tasks, then epilogue
+        with profile_span("build order", "phase"):
+            for phase_roots in [[self.model.tasks["prologue"]], root_tasks, [self.model.tasks["epilogue"]]]:
+                phase_start = len(self.ordered_tasks)
+                for root_task in phase_roots:
+                    self._traverse_task(root_task)
+                self.phases.append(self.ordered_tasks[phase_start:])
+
+    def _traverse_task(self, root_task: NmkTask):
+        # Already traversed sub-graph?
+        if root_task.name in self._traversed:
+            return
+
+        # Iterative depth-first traversal (post-order: dependencies first)
+        path: list[NmkTask] = []
+        path_names: set[str] = set()
+        pending_deps: list[Iterator[NmkTask]] = []
+
+        def enter(task: NmkTask):
+            # Cyclic dependency?
+            assert task.name not in path_names, f"Cyclic dependency: {task.name} referenced from tasks {' -> '.join(t.name for t in path)}"
+            path.append(task)
+            path_names.add(task.name)
+            pending_deps.append(iter(task.subtasks))
+
+        enter(root_task)
+        while len(path):
+            dep = next(pending_deps[-1], None)
+            if dep is None:
+                # All dependencies are traversed: add task
+                task = path.pop()
+                path_names.remove(task.name)
+                pending_deps.pop()
+                self._traversed.add(task.name)
+                self.ordered_tasks.append(task)
+            elif dep.name not in self._traversed:
+                # Traverse dependencies
+                enter(dep)
 
     def print_config(self, print_list: list[str]):
         # Print config is required
@@ -85,41 +116,120 @@ class NmkBuild:
         if print_list is not None and len(print_list):
             self.print_config(print_list)
 
-        # Do the build
-        NmkLogger.debug("Starting the build!")
-        max_task_len = max(len(t.name) for t in self.ordered_tasks)
-        for task in self.ordered_tasks:
-            build_logger = NmkLogWrapper(logging.getLogger((" " * (max_task_len - len(task.name))) + f"[{task.name}]"))
-            if self.model.args.dry_run:
-                # Dry-run mode: don't call builder, just log
-                self.task_prolog(task, build_logger)
-            elif self.needs_build(task, build_logger):
-                # Task needs to be (re)built
-                self.task_build(task, build_logger)
-            else:
-                # Task skipped
-                build_logger.debug("Task skipped, nothing to do")
+        try:
+            # Do the build
+            self._build_tasks()
+        finally:
+            # Persist digests of built tasks
+            if self.digests is not None:
+                self.digests.save()
 
         # Something done?
+        NmkLogger.debug(f"Stat cache: {self.stats.hits} hits, {self.stats.misses} misses")
+        profile_count("stat cache hits", self.stats.hits)
+        profile_count("stat cache misses", self.stats.misses)
         NmkLogger.debug(f"{self.built_tasks} built tasks")
         return self.built_tasks > 0
 
+    def _build_tasks(self):
+        jobs = self.model.args.jobs
+        NmkLogger.debug("Starting the build!" if jobs <= 1 else f"Starting the build! (with {jobs} parallel jobs)")
+        self._max_task_len = max(len(t.name) for t in self.ordered_tasks)
+        if jobs <= 1 or self.model.args.dry_run:
+            # Sequential build (also used in dry-run mode, to keep a stable display order)
+            for task in self.ordered_tasks:
+                self.run_task(task)
+        else:
+            # Parallel build, one phase after the other
+            with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="nmk-build") as executor:
+                for phase in self.phases:
+                    self._build_phase(phase, executor)
+
+    def _build_phase(self, phase: list[NmkTask], executor: ThreadPoolExecutor):
+        # Remaining dependencies for each task of this phase (other ones are already built by previous phases)
+        phase_names = {t.name for t in phase}
+        pending = {t.name: {dep.name for dep in t.subtasks if dep.name in phase_names} for t in phase}
+        running: dict[Future[None], NmkTask] = {}
+        error = None
+
+        while len(pending) or len(running):
+            # Start all ready tasks (in build order), unless an error already occurred
+            if error is None:
+                for task in filter(lambda t: t.name in pending and not len(pending[t.name]), phase):
+                    del pending[task.name]
+                    running[executor.submit(self.run_task, task)] = task
+            if not len(running):
+                # Stopped on error, nothing more to wait for
+                break
+
+            # Wait for at least one running task to complete
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    # Remember first error, and stop scheduling new tasks
+                    if error is None:
+                        NmkLogger.debug(f"Task {task.name} failed, waiting for running tasks to complete")
+                        error = e
+
+                # Task is done: release its dependents
+                for deps in pending.values():
+                    deps.discard(task.name)
+
+        # Propagate first error
+        if error is not None:
+            raise error
+
+    def run_task(self, task: NmkTask):
+        build_logger = NmkLogWrapper(logging.getLogger((" " * (self._max_task_len - len(task.name))) + f"[{task.name}]"))
+        if self.model.args.dry_run:
+            # Dry-run mode: don't call builder, just log
+            self.task_prolog(task, build_logger)
+            return
+
+        # Check if task needs to be (re)built
+        with profile_span(task.name, "check"):
+            needs_build = self.needs_build(task, build_logger)
+        if needs_build:
+            with profile_span(task.name, "task"):
+                self.task_build(task, build_logger)
+        else:
+            # Task skipped
+            build_logger.debug("Task skipped, nothing to do")
+
     def task_prolog(self, task: NmkTask, build_logger: NmkLogWrapper):
-        self.built_tasks += 1
+        with self._built_lock:
+            self.built_tasks += 1
         build_logger.log(logging.DEBUG if task.silent else logging.INFO, task.emoji, task.description)
 
     def task_build(self, task: NmkTask, build_logger: NmkLogWrapper):
         # Prolog
         self.task_prolog(task, build_logger)
 
+        # Builder is loaded on first use (loading errors are reported as is)
+        builder = task.builder
+
         # And build...
         try:
             # Prepare logger
-            task.builder.update_logger(build_logger)
+            builder.update_logger(build_logger)
+
+            # Remember inputs digests before building, if needed
+            record = self.digests_record(task) if self.digests is not None else None
 
             # Invoke builder with provided params (if any)
             params = task.params.value if task.params is not None else {}
-            task.builder.build(**params)
+            try:
+                builder.build(**params)
+            finally:
+                # Outputs are probably updated now
+                self.stats.invalidate(task.outputs)
+
+            # Built: update digests
+            if record is not None:
+                self.digests.update(self.digests_key(task), record)
         except Exception as e:
             raise (
                 e if isinstance(e, NmkStopHereError) else Exception(f"An error occurred during task {task.name} build: {e}").with_traceback(e.__traceback__)
@@ -134,16 +244,16 @@ class NmkBuild:
             return False
 
         # No builder = nothing to build
-        if task.builder is None:
+        if not task.has_builder:
             build_logger.debug("Task doesn't have a builder defined")
             return False
 
         # Unless/if conditions
         if task.run_unless is not None and is_condition_set(task.run_unless.value):
-            build_logger.debug(f'Task "unless" condition is set: {task.run_unless.value}')
+            build_logger.debug(lambda: f'Task "unless" condition is set: {task.run_unless.value}')
             return False
         if task.run_if is not None and not is_condition_set(task.run_if.value):
-            build_logger.debug(f'Task "if" condition is not set: {task.run_if.value}')
+            build_logger.debug(lambda: f'Task "if" condition is not set: {task.run_if.value}')
             return False
 
         # Always build if task doesn't have inputs or outputs (no way to know if something has changed)
@@ -152,7 +262,7 @@ class NmkBuild:
             return True
 
         # All inputs must exist
-        missing_inputs = list(filter(lambda p: not p.is_file() and not task.builder.allow_missing_input(p), task.inputs))
+        missing_inputs = list(filter(lambda p: not self.stats.is_file(p) and not task.builder.allow_missing_input(p), task.inputs))
         assert len(missing_inputs) == 0, f"Task {task.name} miss following inputs:\n" + "\n".join(f" - {p}" for p in missing_inputs)
 
         # Force build?
@@ -160,21 +270,55 @@ class NmkBuild:
             build_logger.debug("Force build, don't check inputs vs outputs")
             return True
 
+        # Check content digests?
+        if self.digests is not None:
+            return self.needs_build_digests(task, build_logger)
+
         # Add all project files to existing inputs
         all_inputs = set(task.inputs + self.model.config[NmkRootConfig.PROJECT_FILES].value)
 
         # Check modification times
-        in_updates = {p.stat().st_mtime: p for p in filter(lambda p: p.exists(), all_inputs)}
-        out_updates = {p.stat().st_mtime if p.exists() else 0: p for p in task.outputs}
+        in_updates = {st.st_mtime: p for p in all_inputs if (st := self.stats.stat(p)) is not None}
+        out_updates = {st.st_mtime if (st := self.stats.stat(p)) is not None else 0: p for p in task.outputs}
         input_max = max(in_updates.keys())
         output_max = min(out_updates.keys())
         if input_max > output_max:
             # At least one input has been modified after the oldest output
             build_logger.debug(
-                f"(Re)Build task: input ({in_updates[input_max]} - {datetime.fromtimestamp(input_max).strftime(TIME_FORMAT)}) "
-                + f"is more recent than output ({out_updates[output_max]} - {datetime.fromtimestamp(output_max).strftime(TIME_FORMAT)})"
+                lambda: (
+                    f"(Re)Build task: input ({in_updates[input_max]} - {datetime.fromtimestamp(input_max).strftime(TIME_FORMAT)}) "
+                    + f"is more recent than output ({out_updates[output_max]} - {datetime.fromtimestamp(output_max).strftime(TIME_FORMAT)})"
+                )
             )
             return True
 
         build_logger.debug("Output is already up to date: skip task")
         return False
+
+    def digests_key(self, task: NmkTask) -> str:
+        # Task key in digests database (tasks from different projects may share the same root folder)
+        return f"{self.model.config[NmkRootConfig.PROJECT_DIR].value}:{task.name}"
+
+    def digests_record(self, task: NmkTask) -> dict:
+        # Digests for all inputs (including project files), params and builder
+        all_inputs = set(task.inputs + self.model.config[NmkRootConfig.PROJECT_FILES].value)
+        return self.digests.task_record(
+            task.builder_name or f"{type(task.builder).__module__}.{type(task.builder).__qualname__}",
+            task.params.value if task.params is not None else {},
+            {p: self.digests.digest(p, st) if (st := self.stats.stat(p)) is not None else None for p in all_inputs},
+        )
+
+    def needs_build_digests(self, task: NmkTask, build_logger: NmkLogWrapper):
+        # All outputs must exist
+        missing_outputs = list(filter(lambda p: not self.stats.exists(p), task.outputs))
+        if len(missing_outputs):
+            build_logger.debug(lambda: f"(Re)Build task: missing output ({missing_outputs[0]})")
+            return True
+
+        # Compare digests with the ones from last build
+        if not self.digests.is_up_to_date(self.digests_key(task), self.digests_record(task)):
+            build_logger.debug("(Re)Build task: inputs, params or builder digests changed since last build")
+            return True
+
+        build_logger.debug("Output is already up to date (same digests): skip task")
+        return False
@@ -1,17 +1,24 @@
 import hashlib
 import importlib.resources
+import json
 import re
 import shutil
 import tarfile
-from functools import cache
+import tempfile
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import IO, TYPE_CHECKING
 from zipfile import ZipFile
 
-import requests
-
+from nmk._internal.profile import profile_count, profile_span
 from nmk.logs import NmkLogger
 
-from ..envbackend import EnvBackend
+if TYPE_CHECKING:  # pragma: no cover
+    import requests
+
+    from nmk.envbackend import EnvBackend
 
 # If remote is not that fast...
 DOWNLOAD_TIMEOUT = 30
@@ -20,16 +27,35 @@ DOWNLOAD_TIMEOUT = 30
 PIP_SCHEME = "pip:"
 PIP_PATTERN = re.compile(PIP_SCHEME + "//(([^<>=/ ]+)[^/ ]*)$")
 
+# Max size of downloaded zip archives to be kept in memory (bigger ones are spooled to disk)
+ZIP_SPOOL_SIZE = 16 * 1024 * 1024
+
+# Max number of concurrent remote references downloads
+PREFETCH_WORKERS = 8
+
 # Global first download flag (to log only once)
 first_download = True
 
+# Downloads state (may be triggered from prefetch threads)
+_downloads_lock = threading.Lock()
+_downloads: dict[tuple[Path, str, bool], Future] = {}
+_downloads_pool: ThreadPoolExecutor | None = None
+
+# Already resolved remote references
+_cached_remotes: dict[tuple[Path, str, bool], Path | None] = {}
+
+# Shared HTTP session (to reuse connections)
+_session: "requests.Session | None" = None
+
 
 def log_install():
     # First download?
     global first_download
-    if first_download:  # pragma: no branch
+    with _downloads_lock:
+        if not first_download:
+            return
         first_download = False
-        NmkLogger.info("arrow_double_down", "Caching remote references...")
+    NmkLogger.info("arrow_double_down", "Caching remote references...")
 
 
 # Referenced wheels set
@@ -46,36 +72,70 @@ def get_referenced_wheels() -> list[str]:
     return sorted(list(_referenced_wheels))
 
 
-@cache
-def pip_install(url: str, env_backend: EnvBackend) -> Path | None:
+# Pip references already installed by a batched install
+_batch_installed_refs: set[str] = set()
+
+
+def _parse_pip_url(url: str) -> tuple[str, str]:
     # Check pip names
     m = PIP_PATTERN.match(url)
     assert m is not None, f"Malformed pip reference: {url}"
     pip_ref = m.group(1)
     wheel_name = m.group(2)
     _remember_referenced_wheel(wheel_name)
-    package_name = wheel_name.replace("-", "_")
+    return pip_ref, wheel_name.replace("-", "_")
+
 
+def _find_python_module(package_name: str) -> Path:
     # Look for installed python module
-    def find_python_module(module: str) -> Path:
-        return Path(importlib.resources.files(package_name))
+    return Path(importlib.resources.files(package_name))
+
+
+def pip_install_missing(urls: list[str], env_backend: Callable[[], "EnvBackend"]):
+    # Look for pip references with missing python module
+    missing_refs = []
+    for url in urls:
+        pip_ref, package_name = _parse_pip_url(url)
+        try:
+            _find_python_module(package_name)
+        except ModuleNotFoundError:
+            if pip_ref not in missing_refs and pip_ref not in _batch_installed_refs:
+                missing_refs.append(pip_ref)
+    if not len(missing_refs):
+        return
+
+    # Install all of them at once, only if env backend is mutable (otherwise, each one will be reported when loaded)
+    backend = env_backend()
+    if backend.is_mutable():
+        log_install()
+        NmkLogger.debug(f"Installing missing pip references: {', '.join(missing_refs)}")
+        with profile_span(" ".join(missing_refs), "pip"):
+            backend.add_packages(missing_refs)
+        _batch_installed_refs.update(missing_refs)
+
+
+def pip_install(url: str, env_backend: Callable[[], "EnvBackend"]) -> Path | None:
+    pip_ref, package_name = _parse_pip_url(url)
 
     try:
         # Something to install?
-        repo_path = find_python_module(package_name)
+        repo_path = _find_python_module(package_name)
     except ModuleNotFoundError:
         # Module not found: trigger install
         log_install()
 
-        # Trigger install only if env backend is mutable
-        if not env_backend.is_mutable():
-            NmkLogger.warning(f"Can't install plugins in this environment; just adding {pip_ref} to requirements and skip reference for now.")
-            return None
-        env_backend.add_packages([pip_ref])
+        # Trigger install only if env backend is mutable (backend is only detected now that it is needed), and not already done in a batch
+        if pip_ref not in _batch_installed_refs:
+            backend = env_backend()
+            if not backend.is_mutable():
+                NmkLogger.warning(f"Can't install plugins in this environment; just adding {pip_ref} to requirements and skip reference for now.")
+                return None
+            with profile_span(pip_ref, "pip"):
+                backend.add_packages([pip_ref])
 
         # Try to find path again
         try:
-            repo_path = find_python_module(package_name)
+            repo_path = _find_python_module(package_name)
         except ModuleNotFoundError as e:
             # Mismatch between wheel and module name, can't find files...
             raise ValueError(f"Can't find module '{package_name}' even after having installed '{pip_ref}' package") from e
@@ -83,67 +143,198 @@ def pip_install(url: str, env_backend: EnvBackend) -> Path | None:
     return repo_path
 
 
-def safe_tar_extract(tar_path: Path, target_path: Path):
-    # Protect against ".." folders in tar -- see https://github.com/advisories/GHSA-gw9q-c7gh-j9vm (CVE-2007-4559)
-    with tarfile.open(name=tar_path, mode="r|*") as tar:
-        for member in tar.getmembers():
-            dest_path = target_path / member.name
+def safe_tar_extract(source: Path | IO[bytes], target_path: Path):
+    # Single pass extraction, from a file or directly from a (non-seekable) stream
+    with tarfile.open(**({"name": source} if isinstance(source, Path) else {"fileobj": source}), mode="r|*") as tar:
+        resolved_target = target_path.resolve()
+        for member in tar:
+            # Protect against ".." folders in tar -- see https://github.com/advisories/GHSA-gw9q-c7gh-j9vm (CVE-2007-4559)
+            dest_path = (target_path / member.name).resolve()
             try:
                 # Destination path *must* be a sub-folder/file of target path
-                dest_path.relative_to(target_path)
-            except ValueError as e:  # pragma: no cover
+                dest_path.relative_to(resolved_target)
+            except ValueError as e:
                 # Invalid entry
                 raise AssertionError(f"Invalid path in tar archive: {member.name}") from e
 
-    # Extract all
-    with tarfile.open(name=tar_path, mode="r|*") as tar:
-        tar.extractall(target_path)
+            # Extract valid member
+            tar.extract(member, target_path)
+
 
+def safe_zip_extract(source: IO[bytes], target_path: Path):
+    # Zip format needs random access: spool stream to memory (or disk if too big) before extraction
+    with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_SIZE) as spool:
+        shutil.copyfileobj(source, spool)
+        spool.seek(0)
+        with ZipFile(spool) as z:
+            z.extractall(target_path)
 
-def download_archive(repo_path: Path, url: str) -> Path:
-    # Download binary file
-    dest_file = repo_path.parent / (repo_path.name + "".join(Path(url).suffixes))
-    dest_file.parent.mkdir(parents=True, exist_ok=True)
-    NmkLogger.debug(f"Downloading {url} to {dest_file}...")
-    with requests.get(url, timeout=DOWNLOAD_TIMEOUT, stream=True) as r, dest_file.open("wb") as f:
-        shutil.copyfileobj(r.raw, f)
-    return dest_file
 
+def get_session() -> "requests.Session":
+    # Lazy session creation, with a connections pool big enough for concurrent downloads
+    global _session
+    with _downloads_lock:
+        if _session is None:
+            # Imported only when something needs to be downloaded
+            import requests
+            from requests.adapters import HTTPAdapter
 
-@cache
-def download_file(root: Path, url: str) -> Path:
-    # Cache path
-    repo_path = root / hashlib.sha1(url.encode("utf-8")).hexdigest()
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=PREFETCH_WORKERS, pool_maxsize=PREFETCH_WORKERS)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+    return _session
 
-    # Something to cache?
-    if not repo_path.exists():
+
+def load_validators(meta_file: Path) -> dict[str, str]:
+    # Read validators stored for a cached entry, and convert them to conditional request headers
+    try:
+        meta = json.loads(meta_file.read_text(encoding="utf-8"))
+    except Exception:
+        # No (or invalid) metadata: can't revalidate
+        return {}
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def save_validators(meta_file: Path, url: str, r: "requests.Response"):
+    # Store response validators next to cached entry
+    meta = {"url": url, "etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+    meta_file.write_text(json.dumps(meta, indent=4), encoding="utf-8")
+
+
+def _download_future(root: Path, url: str, refresh: bool) -> Future:
+    # Already downloading (or downloaded)?
+    global _downloads_pool
+    with _downloads_lock:
+        future = _downloads.get((root, url, refresh))
+        if future is None:
+            # Not yet: submit download to the bounded pool
+            if _downloads_pool is None:
+                _downloads_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="nmk-download")
+            future = _downloads_pool.submit(_download_file, root, url, refresh)
+            _downloads[(root, url, refresh)] = future
+    return future
+
+
+def prefetch_remote(root: Path, remote: str, refresh: bool = False):
+    # Start downloading remote reference in background, if it is a URL one (pip references are installed on demand)
+    remote_url = remote.split("!")[0]
+    if len(remote_url) and not remote_url.startswith(PIP_SCHEME):
+        _download_future(root, remote_url, refresh)
+
+
+def download_file(root: Path, url: str, refresh: bool = False) -> Path:
+    # Wait for (possibly prefetched) download
+    future = _download_future(root, url, refresh)
+    try:
+        return future.result()
+    except Exception:
+        # Forget failed download, so that it can be tried again
+        with _downloads_lock:
+            if _downloads.get((root, url, refresh)) is future:  # pragma: no branch
+                del _downloads[(root, url, refresh)]
+        raise
+
+
+def _download_file(root: Path, url: str, refresh: bool) -> Path:
+    # Cache paths
+    url_hash = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    repo_path = root / url_hash
+    meta_file = root / f"{url_hash}.meta.json"
+
+    # Supported archive format?
+    url_path = Path(url)
+    remote_exts = [e.lower() for e in url_path.suffixes]
+    is_zip = len(remote_exts) > 0 and remote_exts[-1] == ".zip"
+    is_tar = len(remote_exts) > 0 and (".tar" in remote_exts or remote_exts[-1] == ".tgz")
+    is_yml = len(remote_exts) > 0 and remote_exts[-1] == ".yml"
+    if not (is_zip or is_tar or is_yml):
+        raise Exception(f"Unsupported remote file format: {''.join(remote_exts)}")
+    local_path = (repo_path / url_path.name) if is_yml else repo_path
+
+    # Already cached?
+    headers = {}
+    if repo_path.exists():
+        if not refresh:
+            profile_count("remote references cache hits")
+            return local_path
+
+        # Revalidate cached entry
+        headers = load_validators(meta_file)
+        NmkLogger.debug(lambda: f"Revalidating cached {url}{'' if len(headers) else ' (no validators, full download)'}...")
+    else:
         log_install()
 
-        # Supported archive format?
-        url_path = Path(url)
-        remote_exts = [e.lower() for e in url_path.suffixes]
-        if len(remote_exts) and remote_exts[-1] == ".zip":
-            # Download and extract zip
-            with ZipFile(download_archive(repo_path, url)) as z:
-                z.extractall(repo_path)
-        elif len(remote_exts) and (".tar" in remote_exts or remote_exts[-1] == ".tgz"):
-            # Download and extract tar
-            safe_tar_extract(download_archive(repo_path, url), repo_path)
-        elif len(remote_exts) and remote_exts[-1] == ".yml":
-            # Download repo yml
-            repo_path.mkdir(parents=True, exist_ok=True)
-            repo_path = repo_path / url_path.name
-            with requests.get(url, timeout=DOWNLOAD_TIMEOUT, stream=True) as r, repo_path.open("w") as f:
-                f.write(r.text)
-        else:
-            raise Exception(f"Unsupported remote file format: {''.join(remote_exts)}")
+    with profile_span(url, "download"):
+        # Send request (requests module is only imported when something needs to be downloaded)
+        import requests
+
+        try:
+            response = get_session().get(url, timeout=DOWNLOAD_TIMEOUT, stream=True, headers=headers)
+        except requests.RequestException as e:
+            # Revalidation failed to reach remote: keep cached entry
+            if not repo_path.exists():
+                raise
+            NmkLogger.warning(f"Can't revalidate cached {url} ({e}), keep using it")
+            return local_path
+
+        with response as r:
+            # Unchanged since cached?
+            if r.status_code == 304:
+                NmkLogger.debug(lambda: f"Cached {url} is up to date")
+                return local_path
+
+            # Revalidation failed: keep cached entry
+            if repo_path.exists() and not r.ok:
+                NmkLogger.warning(f"Can't revalidate cached {url} (HTTP error {r.status_code}), keep using it")
+                return local_path
+
+            # (Re)download
+            if repo_path.exists():
+                log_install()
+                NmkLogger.debug(lambda: f"Cached {url} changed, download it again")
+                shutil.rmtree(repo_path)
+                meta_file.unlink(missing_ok=True)
+            NmkLogger.debug(lambda: f"Downloading {url} to {repo_path}...")
+            try:
+                if is_zip:
+                    # Download and extract zip
+                    safe_zip_extract(r.raw, repo_path)
+                elif is_tar:
+                    # Download and extract tar, on the fly
+                    safe_tar_extract(r.raw, repo_path)
+                else:
+                    # Download repo yml
+                    repo_path.mkdir(parents=True, exist_ok=True)
+                    with local_path.open("w") as f:
+                        f.write(r.text)
+            except Exception:
+                # Don't keep partially extracted entry
+                shutil.rmtree(repo_path, ignore_errors=True)
+                raise
+
+            # Remember validators for next revalidation
+            if r.ok:
+                save_validators(meta_file, url, r)
 
     # Return downloaded (+extracted) local path
-    return repo_path
+    return local_path
+
+
+def cache_remote(root: Path, remote: str, env_backend: Callable[[], "EnvBackend"], refresh: bool = False) -> Path | None:
+    # Already resolved?
+    key = (root, remote, refresh)
+    if key not in _cached_remotes:
+        _cached_remotes[key] = _cache_remote(root, remote, env_backend, refresh)
+    return _cached_remotes[key]
 
 
-@cache
-def cache_remote(root: Path, remote: str, env_backend: EnvBackend) -> Path | None:
+def _cache_remote(root: Path, remote: str, env_backend: Callable[[], "EnvBackend"], refresh: bool) -> Path | None:
     # Make sure remote format is valid
     parts = remote.split("!")
     assert len(parts) in [1, 2] and all(len(p) > 0 for p in parts), f"Unsupported repo remote syntax: {remote}"
@@ -151,10 +342,21 @@ def cache_remote(root: Path, remote: str, env_backend: EnvBackend) -> Path | Non
     sub_folder = Path(parts[1]) if len(parts) == 2 else Path()
 
     # Resolve remote to local path; may be None if pip install is not possible
-    local_ref_folder = pip_install(remote_url, env_backend) if remote_url.startswith(PIP_SCHEME) else download_file(root, remote_url)
+    local_ref_folder = pip_install(remote_url, env_backend) if remote_url.startswith(PIP_SCHEME) else download_file(root, remote_url, refresh)
 
     # Path will be relative to extracted folder (if suffix is specified)
     if local_ref_folder is not None:
         local_ref_folder = local_ref_folder / sub_folder
-        NmkLogger.debug(f"Cached remote path: {remote} --> {local_ref_folder}")
+        NmkLogger.debug(lambda: f"Cached remote path: {remote} --> {local_ref_folder}")
     return local_ref_folder
+
+
+# Forget remote references state from previous loadings in this process (cached entries may have been removed, or need to be revalidated)
+def reset_remote_state():
+    global first_download
+    _cached_remotes.clear()
+    with _downloads_lock:
+        _downloads.clear()
+        first_download = True
+    _referenced_wheels.clear()
+    _batch_installed_refs.clear()
@@ -3,9 +3,7 @@ import traceback
 from abc import ABC, abstractmethod
 from argparse import Action, ArgumentParser, Namespace
 
-from nmk._internal.loader import NmkLoader
-from nmk.model.config import FINAL_ITEM_PATTERN
-from nmk.model.model import NmkModel
+from nmk._internal.completionindex import NmkCompletionData, NmkCompletionIndex
 
 """
 Contributing classes for CLI completion
@@ -14,29 +12,35 @@ Contributing classes for CLI completion
 
 class ModelCompleter(ABC):
     @abstractmethod
-    def complete(self, model: NmkModel) -> list[str]:  # pragma: no cover
+    def complete(self, data: NmkCompletionData) -> list[str]:  # pragma: no cover
         pass
 
     def __call__(self, prefix: str, action: Action, parser: ArgumentParser, parsed_args: Namespace) -> list[str]:
         try:
-            # Load model
-            loader = NmkLoader(parsed_args, False)
-            return self.complete(loader.model)
+            # Fast path: use completion index, if still fresh
+            index = NmkCompletionIndex.from_args(parsed_args)
+            data = index.load() if index is not None else None
+            if data is None:
+                # Slow path: load model (imported only now, as this is heavy)
+                from nmk._internal.loader import NmkLoader
+
+                data = NmkCompletionData.from_model(NmkLoader(parsed_args, False).model)
+            return self.complete(data)
         except Exception as e:  # pragma: no cover
             logging.debug(f"Exception in completion: {e}\n" + "".join(traceback.format_tb(e.__traceback__)))
         return []  # pragma: no cover
 
 
 class TasksCompleter(ModelCompleter):
-    def complete(self, model: NmkModel) -> list[str]:
+    def complete(self, data: NmkCompletionData) -> list[str]:
         # Complete with known model tasks
-        return model.tasks.keys()
+        return data.tasks
 
 
 class ConfigCompleter(ModelCompleter):
     def __init__(self, with_finals: bool = True):
         self.with_finals = with_finals
 
-    def complete(self, model: NmkModel) -> list[str]:
+    def complete(self, data: NmkCompletionData) -> list[str]:
         # Complete with known config items (with or without final ones)
-        return list(filter(lambda c: self.with_finals or FINAL_ITEM_PATTERN.match(c) is None, model.config.keys()))
+        return [name for name, is_final in data.config.items() if self.with_finals or not is_final]
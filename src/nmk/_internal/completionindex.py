@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import sys
+from argparse import Namespace
+from dataclasses import dataclass
+from pathlib import Path
+
+from nmk import __version__
+
+"""
+Persistent index of model names, used for fast CLI completion
+"""
+
+# Index format version (to be increased each time the persisted structure is changed)
+_INDEX_VERSION = 1
+
+
+@dataclass
+class NmkCompletionData:
+    """
+    Model names needed for completion
+    """
+
+    tasks: list[str]
+    """Task names"""
+
+    config: dict[str, bool]
+    """Config item names, with their final flag"""
+
+    @staticmethod
+    def from_model(model: object) -> "NmkCompletionData":
+        """
+        Extract completion data from a loaded model
+
+        :param model: loaded model instance
+        :return: completion data
+        """
+        return NmkCompletionData(list(model.tasks.keys()), {n: c.is_final for n, c in model.config.items()})  # type: ignore
+
+
+class NmkCompletionIndex:
+    """
+    Completion index file, for a given project (and current working directory)
+    """
+
+    def __init__(self, root_nmk_dir: Path, project: str):
+        key = hashlib.sha256(f"{Path.cwd()}\n{project}".encode()).hexdigest()[:16]
+        self.index_file = root_nmk_dir / "completion" / f"{key}.json"
+
+    @staticmethod
+    def from_args(args: Namespace) -> "NmkCompletionIndex | None":
+        """
+        Get completion index for parsed (but not loaded) args, if root folder can be found
+
+        :param args: parsed command line args
+        :return: completion index instance, or None if root folder is unknown
+        """
+        root = args.root
+        if root is None:
+            # Same default as for loader: parent folder of currently running venv
+            if sys.prefix == sys.base_prefix:  # pragma: no cover
+                return None
+            root = Path(sys.prefix).parent
+        return NmkCompletionIndex(root / ".nmk", args.project)
+
+    def save(self, data: NmkCompletionData, files: list[Path]):
+        """
+        Persist completion data for the current project
+
+        :param data: completion data
+        :param files: project files from which data was loaded
+        """
+        try:
+            content = {
+                "version": [_INDEX_VERSION, __version__],
+                "files": {str(f.resolve()): f.stat().st_mtime_ns for f in files},
+                "tasks": data.tasks,
+                "config": data.config,
+            }
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+
+            # Write to a temporary file first, to stay safe with concurrent nmk instances
+            tmp_file = self.index_file.with_name(f"{self.index_file.name}.{os.getpid()}")
+            tmp_file.write_text(json.dumps(content))
+            tmp_file.replace(self.index_file)
+        except Exception:  # pragma: no cover
+            # Index is only an optimization: ignore writing errors
+            pass
+
+    def load(self) -> NmkCompletionData | None:
+        """
+        Load completion data, if index is still fresh
+
+        :return: completion data, or None if index is missing or outdated
+        """
+        try:
+            content = json.loads(self.index_file.read_text())
+            if content["version"] != [_INDEX_VERSION, __version__]:  # pragma: no cover
+                return None
+            for f, mtime in content["files"].items():
+                if Path(f).stat().st_mtime_ns != mtime:
+                    return None
+            return NmkCompletionData(content["tasks"], content["config"])
+        except Exception:
+            # Missing or corrupted index (or deleted project file)
+            return None
@@ -0,0 +1,382 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import socket
+import stat
+import subprocess
+import sys
+import sysconfig
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser, Namespace
+from contextlib import suppress
+from pathlib import Path
+from typing import Any
+
+from nmk import __version__
+from nmk.__main__ import run
+from nmk._internal.modelcache import NmkModelCache
+from nmk._internal.parser import NmkParser
+from nmk.logs import NmkLogger
+
+"""
+Persistent nmk daemon, keeping imported modules and parsed project files in memory between builds of a root folder
+"""
+
+DAEMON_SUPPORTED = hasattr(socket, "AF_UNIX") and hasattr(os, "getuid")
+"""Daemon mode is only supported on platforms with Unix sockets"""
+
+DAEMON_IDLE_TIMEOUT = 30 * 60
+"""Daemon exits after this delay without any request (in seconds)"""
+
+# Max delay for a newly spawned daemon to be ready (in seconds)
+_START_TIMEOUT = 10.0
+
+
+def daemon_socket_path(root: Path) -> Path:
+    """
+    Get daemon socket path for a given root folder (in a private temporary folder, as socket paths length is limited)
+
+    :param root: resolved root folder
+    :return: socket path
+    """
+    key = hashlib.sha256(str(root).encode()).hexdigest()[:16]
+    return Path(tempfile.gettempdir()) / f"nmk-{os.getuid()}" / f"{key}.sock"
+
+
+def _is_private_dir(folder: Path) -> bool:
+    # Socket folder must be a real directory (not a symlink), owned by current user, and only accessible to this user
+    try:
+        st = folder.lstat()
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and stat.S_IMODE(st.st_mode) == 0o700
+
+
+def _daemon_root(args: Namespace) -> Path | None:
+    # Same root folder as for loader (or None if it can't be found; build will fail in-process)
+    if args.root is not None:
+        return args.root.resolve() if args.root.is_dir() else None
+    if sys.prefix == sys.base_prefix:  # pragma: no cover
+        return None
+    return Path(sys.prefix).parent.resolve()
+
+
+class _NmkChannel:
+    # Thread-safe frames writer to a daemon client (logs may be written from build threads)
+    def __init__(self, conn: socket.socket):
+        self._conn = conn
+        self._lock = threading.Lock()
+        self.connected = True
+
+    def send(self, frame: dict[str, Any]):
+        data = (json.dumps(frame) + "\n").encode()
+        with self._lock:
+            if not self.connected:
+                return
+            try:
+                self._conn.sendall(data)
+            except OSError:  # pragma: no cover
+                # Client is gone: keep building, but drop output
+                self.connected = False
+
+
+class _NmkStreamWriter(io.TextIOBase):
+    # Text stream forwarded to a daemon client output stream
+    def __init__(self, channel: _NmkChannel, name: str, tty: bool):
+        self._channel = channel
+        self._name = name
+        self._tty = tty
+
+    @property
+    def encoding(self) -> str:  # type: ignore
+        return "utf-8"
+
+    def isatty(self) -> bool:
+        return self._tty
+
+    def write(self, s: str) -> int:
+        if s:
+            self._channel.send({self._name: s})
+        return len(s)
+
+
+class NmkDaemon:
+    """
+    Background nmk server for a root folder, handling build requests sent by nmk clients on a Unix socket
+
+    Requests are handled one at a time, in the daemon process; parsed project files models are kept in memory
+    (and only reloaded when modified), as well as imported modules (nmk plugins, resolvers, builders, etc.).
+    The nmk model itself is built again for each request, as config values and tasks state depend on the build context
+    (command line, environment, files on disk).
+    Daemon exits if installed python code changed (requests are then built by clients, in their own process).
+
+    :param root: resolved root folder
+    :param idle_timeout: delay without any request before exiting (in seconds)
+    """
+
+    def __init__(self, root: Path, idle_timeout: float = DAEMON_IDLE_TIMEOUT):
+        self.root = root
+        self.socket_path = daemon_socket_path(root)
+        self.idle_timeout = idle_timeout
+        self.requests = 0
+        self._model_cache: NmkModelCache | None = None
+        self._watched_files: dict[str, int] = {}
+        self._running = False
+
+    def _log(self, message: str):
+        # Daemon own logs (process stdout, even while a request is handled)
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} [{os.getpid()}] {message}", file=sys.__stdout__, flush=True)
+
+    def serve(self):
+        """
+        Serve build requests, until stopped or idle for too long
+        """
+        import fcntl
+
+        # Don't serve from a folder that may be controlled by another user
+        self.socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not _is_private_dir(self.socket_path.parent):
+            self._log(f"Refusing to serve from insecure socket folder: {self.socket_path.parent}")
+            return
+
+        # Only one daemon per root folder
+        with self.socket_path.with_suffix(".lock").open("w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._log(f"Another nmk daemon is already running for {self.root}")
+                return
+
+            # Listen on a fresh socket
+            self.socket_path.unlink(missing_ok=True)
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+                server.bind(str(self.socket_path))
+                self.socket_path.chmod(0o600)
+                server.listen()
+                server.settimeout(self.idle_timeout)
+                self._watched_files = self._snapshot()
+                self._running = True
+                self._log(f"nmk daemon {__version__} started for {self.root} (socket: {self.socket_path})")
+                try:
+                    while self._running:
+                        try:
+                            conn, _ = server.accept()
+                        except TimeoutError:
+                            self._log("Idle for too long")
+                            break
+                        with conn:
+                            conn.settimeout(None)
+                            self._handle(conn)
+                finally:
+                    self.socket_path.unlink(missing_ok=True)
+                    self._log("nmk daemon stopped")
+
+    def _handle(self, conn: socket.socket):
+        # Read request
+        channel = _NmkChannel(conn)
+        try:
+            with conn.makefile("rb") as f:
+                request = json.loads(f.readline())
+        except Exception as e:  # pragma: no cover
+            self._log(f"Invalid request: {e}")
+            return
+
+        # Stop request?
+        if request.get("stop"):
+            self._log("Stop requested")
+            self._running = False
+            channel.send({"exit": 0})
+            return
+
+        # Can this daemon still handle builds?
+        reason = f"nmk version changed ({__version__} --> {request.get('version')})" if request.get("version") != __version__ else self._stale_reason()
+        if reason is not None:
+            self._log(f"Exiting: {reason}")
+            self._running = False
+            channel.send({"fallback": reason})
+            return
+
+        # Build, and send result to client
+        channel.send({"exit": self._build(request, channel)})
+
+    def _build(self, request: dict[str, Any], channel: _NmkChannel) -> int:
+        # Process state to be restored after the build
+        self.requests += 1
+        self._log(f"Handling request #{self.requests} in {request['cwd']}: {request['argv']}")
+        cwd, env = os.getcwd(), dict(os.environ)
+        streams = (sys.stdout, sys.stderr)
+        root_handlers = list(logging.root.handlers)
+        meta_path = list(sys.meta_path)
+        try:
+            # Run in client context
+            os.chdir(request["cwd"])
+            out_tty, err_tty = request.get("tty", [False, False])
+            sys.stdout = _NmkStreamWriter(channel, "out", out_tty)
+            sys.stderr = _NmkStreamWriter(channel, "err", err_tty)
+            try:
+                args = NmkParser().parse(request["argv"])
+            except SystemExit as e:
+                # Invalid args, help, version: already displayed by parser
+                return e.code if isinstance(e.code, int) else 2
+            os.environ.clear()
+            os.environ.update(request["env"])
+
+            # Models cache is shared by all builds (but cleared along with the cache folder)
+            if self._model_cache is None or args.no_cache:
+                self._model_cache = NmkModelCache(self.root / ".nmk" / "models.pickle", copy_on_hit=True)
+            return run(args, self._model_cache)
+        except Exception as e:  # pragma: no cover
+            print(f"nmk daemon error: {e}", file=sys.stderr)
+            return 1
+        finally:
+            sys.stdout, sys.stderr = streams
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(env)
+
+            # Forget logging handlers and import finders installed by this build
+            for handler in filter(lambda h: h not in root_handlers, list(logging.root.handlers)):
+                logging.root.removeHandler(handler)
+            known_finders = set(map(id, meta_path))
+            sys.meta_path[:] = [f for f in sys.meta_path if id(f) in known_finders]
+
+            # Remember imported python files state
+            self._watched_files = self._snapshot()
+
+    def _snapshot(self) -> dict[str, int]:
+        # Modification times of site-packages folders (updated when packages are installed) and imported python files (except standard library ones)
+        paths = sysconfig.get_paths()
+        stdlib = paths["stdlib"]
+        files = {paths["purelib"], paths["platlib"]}
+        files.update(f for f in (getattr(m, "__file__", None) for m in list(sys.modules.values())) if isinstance(f, str) and not f.startswith(stdlib))
+        out = {}
+        for f in files:
+            with suppress(OSError):
+                out[f] = os.stat(f).st_mtime_ns
+        return out
+
+    def _stale_reason(self) -> str | None:
+        # Imported code must be reloaded if any python file (or installed package) changed
+        for f, mtime in self._watched_files.items():
+            try:
+                if os.stat(f).st_mtime_ns == mtime:
+                    continue
+            except OSError:
+                pass
+            return f"python code changed ({f})"
+        return None
+
+
+def _connect(root: Path) -> socket.socket | None:
+    # Connect to running daemon, if any (and only through a private socket folder, as requests hold environment variables)
+    socket_path = daemon_socket_path(root)
+    if not _is_private_dir(socket_path.parent):
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(str(socket_path))
+        return conn
+    except OSError:
+        conn.close()
+        return None
+
+
+def _spawn(root: Path) -> socket.socket | None:
+    # Start a new daemon (detached from this process), with its own log file
+    NmkLogger.debug(f"Starting nmk daemon for {root}")
+    log_file = root / ".nmk" / "daemon.log"
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with log_file.open("ab") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "nmk._internal.daemon", str(root)],
+            cwd=root,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+    # Wait for it to be ready
+    deadline = time.monotonic() + _START_TIMEOUT
+    while time.monotonic() < deadline and process.poll() is None:
+        conn = _connect(root)
+        if conn is not None:
+            return conn
+        time.sleep(0.05)
+    return _connect(root)
+
+
+def run_in_daemon(args: Namespace, argv: list[str]) -> int | None:
+    """
+    Delegate build to the daemon for the root folder (started if not running yet)
+
+    :param args: parsed command line args
+    :param argv: raw command line args (to be parsed again by the daemon)
+    :return: build return code, or None if daemon is not available (build is then expected to run in current process)
+    """
+
+    # Connect to daemon
+    root = _daemon_root(args)
+    if DAEMON_SUPPORTED and root is not None:
+        socket_folder = daemon_socket_path(root).parent
+        if os.path.lexists(socket_folder) and not _is_private_dir(socket_folder):
+            NmkLogger.warning(f"Insecure nmk daemon socket folder (must be a directory only accessible to current user): {socket_folder}")
+            root = None
+    conn = (_connect(root) or _spawn(root)) if DAEMON_SUPPORTED and root is not None else None
+    if conn is None:
+        NmkLogger.debug("nmk daemon is not available, building in current process")
+        return None
+
+    # Send request, then forward daemon output until build is done
+    request = {"version": __version__, "argv": argv, "cwd": os.getcwd(), "env": dict(os.environ), "tty": [sys.stdout.isatty(), sys.stderr.isatty()]}
+    streams = {"out": sys.stdout, "err": sys.stderr}
+    with conn, conn.makefile("r", encoding="utf-8") as f:
+        conn.sendall((json.dumps(request) + "\n").encode())
+        for line in f:
+            frame = json.loads(line)
+            if "exit" in frame:
+                return frame["exit"]
+            if "fallback" in frame:
+                NmkLogger.debug(f"nmk daemon can't handle build ({frame['fallback']}), building in current process")
+                return None
+            for name, text in frame.items():
+                streams[name].write(text)
+                streams[name].flush()
+
+    # Daemon died while building
+    print("nmk daemon connection lost", file=sys.stderr)
+    return 1
+
+
+def stop_daemon(args: Namespace) -> int:
+    """
+    Stop the daemon for the root folder, if running
+
+    :param args: parsed command line args
+    :return: return code (always 0)
+    """
+    root = _daemon_root(args)
+    conn = _connect(root) if DAEMON_SUPPORTED and root is not None else None
+    if conn is not None:
+        with conn, conn.makefile("r", encoding="utf-8") as f:
+            conn.sendall((json.dumps({"version": __version__, "stop": True}) + "\n").encode())
+            f.readline()
+    return 0
+
+
+def main(argv: list[str]) -> int:  # pragma: no cover
+    # Daemon process entry point
+    parser = ArgumentParser(description="nmk daemon")
+    parser.add_argument("root", type=Path, help="root folder")
+    parser.add_argument("--idle-timeout", type=float, default=DAEMON_IDLE_TIMEOUT, help="exit after this delay without any request (in seconds)")
+    args = parser.parse_args(argv)
+    NmkDaemon(args.root.resolve(), args.idle_timeout).serve()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+from nmk.logs import NmkLogger
+
+# Chunk size for file hashing
+_CHUNK_SIZE = 1024 * 1024
+
+# Database format version (to be increased each time the persisted structure is changed)
+_DB_VERSION = 1
+
+
+def file_digest(p: Path) -> str:
+    """
+    Compute file content digest, reading it by chunks
+
+    :param p: path to file
+    :return: file sha256 digest
+    """
+    h = hashlib.sha256()
+    with p.open("rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class NmkDigests:
+    """
+    Persistent database of task inputs digests, used to check if tasks are up to date regardless of files modification times
+    """
+
+    def __init__(self, db_file: Path):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._files: dict[str, list[Any]] = {}
+        self._tasks: dict[str, dict[str, Any]] = {}
+        self._dirty = False
+
+        # Load database, if any
+        if self.db_file.is_file():
+            try:
+                db = json.loads(self.db_file.read_text(encoding="utf-8"))
+                if db["version"] == _DB_VERSION:  # pragma: no branch
+                    self._files = db["files"]
+                    self._tasks = db["tasks"]
+            except Exception as e:
+                # Corrupted database: just ignore it (will be rewritten)
+                NmkLogger.debug(f"Ignoring invalid digests database ({self.db_file}): {e}")
+
+    def digest(self, p: Path, st: os.stat_result) -> str:
+        """
+        Get file digest, only hashing it again if it changed since last time (according to inode, modification time and size)
+
+        :param p: path to file
+        :param st: file stat result
+        :return: file digest
+        """
+
+        # File stats
+        key = str(p)
+        stamp = [st.st_ino, st.st_mtime_ns, st.st_size]
+
+        # Known file?
+        entry = self._files.get(key)
+        if entry is not None and entry[:3] == stamp:
+            return entry[3]
+
+        # Hash it and remember
+        out = file_digest(p)
+        with self._lock:
+            self._files[key] = stamp + [out]
+            self._dirty = True
+        return out
+
+    def task_record(self, builder: str, params: Any, inputs: dict[Path, str | None]) -> dict[str, Any]:
+        """
+        Build task digests record
+
+        :param builder: task builder qualified class name
+        :param params: task builder resolved parameters
+        :param inputs: task input files digests
+        :return: task record
+        """
+        return {
+            "builder": builder,
+            "params": hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest(),
+            "inputs": {str(p): d for p, d in sorted(inputs.items())},
+        }
+
+    def is_up_to_date(self, key: str, record: dict[str, Any]) -> bool:
+        """
+        Check if task record is the same than the one stored after last build
+
+        :param key: task key
+        :param record: current task record
+        :return: True if record is unchanged
+        """
+        return self._tasks.get(key) == record
+
+    def update(self, key: str, record: dict[str, Any]):
+        """
+        Store task record once built
+
+        :param key: task key
+        :param record: task record
+        """
+        with self._lock:
+            self._tasks[key] = record
+            self._dirty = True
+
+    def save(self):
+        """
+        Persist database file, if updated
+        """
+        with self._lock:
+            if self._dirty:
+                NmkLogger.debug(f"Saving digests database to {self.db_file}")
+                self.db_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = self.db_file.with_name(f"{self.db_file.name}.{os.getpid()}")
+                tmp_file.write_text(json.dumps({"version": _DB_VERSION, "files": self._files, "tasks": self._tasks}), encoding="utf-8")
+                tmp_file.replace(self.db_file)
+                self._dirty = False
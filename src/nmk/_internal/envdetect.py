@@ -0,0 +1,21 @@
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from nmk.logs import NmkLogger
+
+if TYPE_CHECKING:  # pragma: no cover
+    from nmk.envbackend import EnvBackend
+
+"""
+Deferred python environment backend detection
+"""
+
+
+@cache
+def get_env_backend(project_dir: Path | None) -> "EnvBackend":
+    # Backend module is only imported (and detection performed) on first use, then memoized for this project dir
+    from nmk.envbackend import EnvBackendFactory
+
+    NmkLogger.debug(f"Detecting python environment backend (project dir: {project_dir})")
+    return EnvBackendFactory.detect(project_dir, verbose_subprocess=False)
@@ -3,14 +3,14 @@ from collections.abc import Callable
 from dataclasses import dataclass
 from functools import cache
 from pathlib import Path
-from typing import cast
+from typing import TYPE_CHECKING
 
-import jsonschema
-import yaml
 from rich.emoji import Emoji
 from rich.text import Text
 
-from nmk._internal.cache import PIP_SCHEME, cache_remote
+from nmk._internal.cache import PIP_SCHEME, cache_remote, pip_install_missing, prefetch_remote
+from nmk._internal.modelcache import NmkModelCache
+from nmk._internal.yamlloader import load_yaml
 from nmk.errors import NmkFileLoadingError
 from nmk.logs import NmkLogger
 from nmk.model.builder import NmkTaskBuilder
@@ -20,7 +20,8 @@ from nmk.model.model import NmkModel
 from nmk.model.resolver import NmkConfigResolver
 from nmk.model.task import NmkTask
 
-from ..envbackend import EnvBackendFactory
+if TYPE_CHECKING:  # pragma: no cover
+    from jsonschema.protocols import Validator
 
 # Known URL schemes
 GITHUB_SCHEME = "github:"
@@ -68,19 +69,38 @@ class NmkRepo:
 def load_schema() -> dict:
     model_file = Path(__file__).parent / "model.yml"
     NmkLogger.debug(f"Loading model schema from {model_file}")
-    with model_file.open() as f:
-        schema = yaml.full_load(f)
-    return schema
+    return load_yaml(model_file)
+
+
+@cache
+def load_validator() -> "Validator":
+    import jsonschema
+
+    # Schema is checked only once, then validator instance is reused for all project files
+    schema = load_schema()
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
 
 
 # Recursive model file loader
 class NmkModelFile:
     def __init__(
-        self, project_ref: str, repo_cache: Path, model: NmkModel, refs: list[str], is_internal: bool = False, known_project_dir_callback: Callable = None
+        self,
+        project_ref: str,
+        repo_cache: Path,
+        model: NmkModel,
+        refs: list[str],
+        is_internal: bool = False,
+        known_project_dir_callback: Callable = None,
+        model_cache: NmkModelCache | None = None,
     ):
         # Init properties
         self._repos = None
+        self.resolved_items: list[NmkConfig] = []
+        self.tasks: list[NmkTask] = []
         self.repo_cache = repo_cache
+        self.model_cache = model_cache
         self.global_model = model
         self.project_ref = project_ref
         self.parent_refs = refs
@@ -95,45 +115,30 @@ class NmkModelFile:
             # Remember project dir if first file (and not an internal one)
             if not is_internal and not len(refs):
                 p_dir = self.file.parent.resolve()
-                NmkLogger.debug(f"{NmkRootConfig.PROJECT_DIR} updated to {p_dir}")
+                NmkLogger.debug(lambda: f"{NmkRootConfig.PROJECT_DIR} updated to {p_dir}")
                 model.config[NmkRootConfig.PROJECT_DIR].static_value = p_dir
                 model.config[NmkRootConfig.PROJECT_NMK_DIR].static_value = p_dir / ".nmk"
                 if known_project_dir_callback:  # pragma: no branch
                     # Notify callback that all dirs are known
                     known_project_dir_callback(model)
 
-                # Also setup env backend from project directory
-                model.env_backend = EnvBackendFactory.detect(p_dir, verbose_subprocess=False)
-                if hasattr(model.env_backend, "_pip_args"):  # pragma: no branch
-                    # Legacy backend: also set legacy pip args if any
-                    model.pip_args = cast(str, model.env_backend._pip_args)  # type: ignore
-
             # Remember file path in model (to avoid recursive loading; and only if not an internal one)
             if self.file in model.file_paths:
                 # Already known file
-                NmkLogger.debug(f"{self.file} file already loaded, ignore...")
+                NmkLogger.debug(lambda: f"{self.file} file already loaded, ignore...")
                 return
             if not is_internal:
                 model.file_paths.append(self.file)
 
-            # Load YAML model
+            # Load YAML model (from cache if file is unchanged)
             assert self.file.is_file(), "Project file not found"
-            NmkLogger.debug(f"Loading model from {self.file}")
-            try:
-                with self.file.open() as f:
-                    self.model = yaml.full_load(f)
-            except Exception as e:
-                raise Exception(f"Project is malformed: {e}") from e
-
-            # Validate model against grammar
-            try:
-                jsonschema.validate(self.model, load_schema())
-            except Exception as e:
-                raise Exception(f"Project contains invalid data: {e}") from e
+            self.model = self.model_cache.load(self.file, self.load_model) if self.model_cache is not None else self.load_model()
 
-            # Load references
-            for ref_file_path in self.refs:
-                NmkModelFile(ref_file_path, self.repo_cache, model, refs + [project_ref])
+            # Start downloading remote references in background, then load them (in declaration order)
+            ref_file_paths = self.refs
+            self.prefetch(ref_file_paths)
+            for ref_file_path in ref_file_paths:
+                NmkModelFile(ref_file_path, self.repo_cache, model, refs + [project_ref], model_cache=self.model_cache)
 
             # Remember file model (in loading order)
             model.file_models[self.file] = self
@@ -143,6 +148,22 @@ class NmkModelFile:
                 raise e
             self.__raise_with_refs(e)
 
+    def load_model(self) -> dict:
+        # Load YAML model (parsing modules are imported only on models cache miss)
+        from jsonschema.exceptions import best_match
+
+        NmkLogger.debug(lambda: f"Loading model from {self.file}")
+        try:
+            model = load_yaml(self.file)
+        except Exception as e:
+            raise Exception(f"Project is malformed: {e}") from e
+
+        # Validate model against grammar (same error as jsonschema.validate, i.e. the most relevant one)
+        error = best_match(load_validator().iter_errors(model))
+        if error is not None:
+            raise Exception(f"Project contains invalid data: {error}") from error
+        return model
+
     def __raise_with_refs(self, e: Exception):
         # Raise an exception with parent files
         raise NmkFileLoadingError(
@@ -155,11 +176,32 @@ class NmkModelFile:
         scheme_candidate = project_path.parts[0]
         return not project_path.is_absolute() and scheme_candidate in URL_SCHEMES
 
+    def prefetch(self, ref_file_paths: list[str]):
+        # Trigger background download for all remote references
+        pip_urls = []
+        for ref_file_path in filter(self.is_url, ref_file_paths):
+            try:
+                remote = self.convert_url(ref_file_path)
+                prefetch_remote(self.repo_cache, remote, self.global_model.args.refresh_refs)
+                if remote.startswith(PIP_SCHEME):
+                    pip_urls.append(remote.split("!")[0])
+            except Exception as e:
+                # Invalid reference: will be reported when actually loaded
+                NmkLogger.debug(f"Can't prefetch {ref_file_path}: {e}")
+
+        # Install all missing pip references at once
+        if len(pip_urls):
+            try:
+                pip_install_missing(pip_urls, lambda: self.global_model.env_backend)
+            except Exception as e:
+                # Install issue: will be reported when each reference is actually loaded
+                NmkLogger.debug(f"Can't install pip references: {e}")
+
     def resolve_project(self, project_ref: str) -> Path | None:
         # URL?
         if self.is_url(project_ref):
             # Cache-able reference
-            return cache_remote(self.repo_cache, self.convert_url(project_ref), self.global_model.env_backend)
+            return cache_remote(self.repo_cache, self.convert_url(project_ref), lambda: self.global_model.env_backend, self.global_model.args.refresh_refs)
 
         # Default case: assumed to be a local path
         return Path(project_ref)
@@ -275,12 +317,14 @@ class NmkModelFile:
             for name, candidate in self.model[NmkModelK.CONFIG].items():
                 # Complex item?
                 if isinstance(candidate, dict) and NmkModelK.RESOLVER in candidate:
-                    # With a resolver, and eventually params
-                    self.global_model.add_config(
-                        name,
-                        self.file.parent,
-                        resolver=self.global_model.load_class(candidate[NmkModelK.RESOLVER], NmkConfigResolver),
-                        resolver_params=self.load_property(candidate, NmkModelK.PARAMS, mapper=lambda v, n: self.load_param_dict(v, n), task_name=name),
+                    # With a resolver (loaded on demand), and eventually params
+                    self.resolved_items.append(
+                        self.global_model.add_config(
+                            name,
+                            self.file.parent,
+                            resolver_loader=self.class_loader(candidate[NmkModelK.RESOLVER], NmkConfigResolver),
+                            resolver_params=self.load_property(candidate, NmkModelK.PARAMS, mapper=lambda v, n: self.load_param_dict(v, n), task_name=name),
+                        )
                     )
                 else:
                     # Simple config item, direct add
@@ -297,26 +341,26 @@ class NmkModelFile:
             # Iterate on task items
             for name, candidate in self.model[NmkModelK.TASKS].items():
                 # Contribute to model
-                self.global_model.add_task(
-                    NmkTask(
-                        name,
-                        self.load_property(candidate, NmkModelK.DESCRIPTION),
-                        self.load_property(candidate, NmkModelK.SILENT, False),
-                        self.load_property(candidate, NmkModelK.EMOJI, mapper=self.load_emoji),
-                        self.load_property(candidate, NmkModelK.BUILDER, mapper=lambda cls: self.global_model.load_class(cls, NmkTaskBuilder)),
-                        self.load_property(candidate, NmkModelK.PARAMS, mapper=lambda v, n: self.load_param_dict(v, n), task_name=name),
-                        self.load_property(
-                            candidate, NmkModelK.DEPS, [], mapper=lambda dp: [i for n, i in enumerate(dp) if i not in dp[:n]]
-                        ),  # Remove duplicates
-                        self.load_property(candidate, NmkModelK.APPEND_TO),
-                        self.load_property(candidate, NmkModelK.PREPEND_TO),
-                        self.load_property(candidate, NmkModelK.INPUT, mapper=lambda v, n: self.load_str_list_cfg(v, n, NmkModelK.INPUT), task_name=name),
-                        self.load_property(candidate, NmkModelK.OUTPUT, mapper=lambda v, n: self.load_str_list_cfg(v, n, NmkModelK.OUTPUT), task_name=name),
-                        self.load_property(candidate, NmkModelK.IF, mapper=lambda v, n: self.load_str_cfg(v, n, NmkModelK.IF), task_name=name),
-                        self.load_property(candidate, NmkModelK.UNLESS, mapper=lambda v, n: self.load_str_cfg(v, n, NmkModelK.UNLESS), task_name=name),
-                        self.global_model,
-                    ),
+                task = NmkTask(
+                    name,
+                    self.load_property(candidate, NmkModelK.DESCRIPTION),
+                    self.load_property(candidate, NmkModelK.SILENT, False),
+                    self.load_property(candidate, NmkModelK.EMOJI, mapper=self.load_emoji),
+                    None,  # Builder is loaded on demand
+                    self.load_property(candidate, NmkModelK.PARAMS, mapper=lambda v, n: self.load_param_dict(v, n), task_name=name),
+                    self.load_property(candidate, NmkModelK.DEPS, [], mapper=lambda dp: [i for n, i in enumerate(dp) if i not in dp[:n]]),  # Remove duplicates
+                    self.load_property(candidate, NmkModelK.APPEND_TO),
+                    self.load_property(candidate, NmkModelK.PREPEND_TO),
+                    self.load_property(candidate, NmkModelK.INPUT, mapper=lambda v, n: self.load_str_list_cfg(v, n, NmkModelK.INPUT), task_name=name),
+                    self.load_property(candidate, NmkModelK.OUTPUT, mapper=lambda v, n: self.load_str_list_cfg(v, n, NmkModelK.OUTPUT), task_name=name),
+                    self.load_property(candidate, NmkModelK.IF, mapper=lambda v, n: self.load_str_cfg(v, n, NmkModelK.IF), task_name=name),
+                    self.load_property(candidate, NmkModelK.UNLESS, mapper=lambda v, n: self.load_str_cfg(v, n, NmkModelK.UNLESS), task_name=name),
+                    self.global_model,
+                    builder_name=self.load_property(candidate, NmkModelK.BUILDER),
+                    builder_loader=self.load_property(candidate, NmkModelK.BUILDER, mapper=lambda cls: self.class_loader(cls, NmkTaskBuilder)),
                 )
+                self.global_model.add_task(task)
+                self.tasks.append(task)
 
                 # If declared as default task, remember it in model
                 if self.load_property(candidate, NmkModelK.DEFAULT, False):
@@ -325,6 +369,28 @@ class NmkModelFile:
         except Exception as e:
             self.__raise_with_refs(e)
 
+    def class_loader(self, qualified_class: str, expected_type: object) -> Callable[[], object]:
+        # Delay class import + instantiation until first use
+        def load() -> object:
+            try:
+                return self.global_model.load_class(qualified_class, expected_type)
+            except Exception as e:
+                self.__raise_with_refs(e)
+
+        return load
+
+    def validate_classes(self):
+        try:
+            # Load all resolvers (and their types) and builders declared in this file
+            for cfg in self.resolved_items:
+                _ = cfg.value_type
+            for task in self.tasks:
+                _ = task.builder
+        except Exception as e:
+            if isinstance(e, NmkFileLoadingError):
+                raise e
+            self.__raise_with_refs(e)
+
     def load_paths(self):
         try:
             # Is this file providing python path contribution?
@@ -8,8 +8,11 @@ from argparse import Namespace
 from logging.handlers import MemoryHandler
 from pathlib import Path
 
-from nmk._internal.cache import get_referenced_wheels
+from nmk._internal.cache import get_referenced_wheels, reset_remote_state
+from nmk._internal.completionindex import NmkCompletionData, NmkCompletionIndex
 from nmk._internal.files import NmkModelFile
+from nmk._internal.modelcache import NmkModelCache
+from nmk._internal.profile import profile_span
 from nmk.errors import NmkNoLogsError
 from nmk.logs import NmkLogger, logging_finalize_setup, logging_initial_setup
 from nmk.model.config import NmkStaticConfig
@@ -21,25 +24,41 @@ CONFIG_STRING_PATTERN = re.compile("^([^ =]+)=(.*)$")
 
 
 class NmkLoader:
-    def __init__(self, args: Namespace, with_logs: bool = True):
+    def __init__(self, args: Namespace, with_logs: bool = True, model_cache: NmkModelCache | None = None):
         # Finish args parsing
         self._logs_mem_handler = self.finish_parsing(args, with_logs)
 
+        # Remote references state is scoped to this loading
+        reset_remote_state()
+
         # Prepare repo cache and empty model
         self.root_nmk_dir = args.nmk_dir
         self.repo_cache: Path = self.root_nmk_dir / "cache"
+        self.model_cache = model_cache if model_cache is not None else NmkModelCache(self.root_nmk_dir / "models.pickle")
         self.model = NmkModel(args)
 
         # Load model
-        self.load_model_from_files()
+        with profile_span("project files", "load"):
+            self.load_model_from_files()
+        completion_data = NmkCompletionData.from_model(self.model)
 
         # Override config from args, if any
         config_list = self.model.args.config
         if config_list is not None and len(config_list):
-            self.override_config(config_list)
+            with profile_span("config override", "load"):
+                self.override_config(config_list)
 
         # Validate tasks after full loading process
-        self.validate_tasks()
+        with profile_span("tasks validation", "load"):
+            self.validate_tasks()
+
+        # Load all classes if required (otherwise loaded on demand)
+        if self.model.args.validate:
+            with profile_span("classes validation", "load"):
+                self.validate_classes()
+
+        # Model is fully loaded: refresh completion index (with config items from files only)
+        NmkCompletionIndex(self.root_nmk_dir, self.model.args.project).save(completion_data, self.model.file_paths)
 
     def load_model_from_files(self):
         # Add built-in config items
@@ -58,7 +77,9 @@ class NmkLoader:
             self.model.add_config(name, None, value)
 
         # Init inner model loading
-        NmkModelFile(Path(importlib.resources.files("nmk.model")) / "internal.yml", self.repo_cache, self.model, [], is_internal=True)
+        NmkModelFile(
+            Path(importlib.resources.files("nmk.model")) / "internal.yml", self.repo_cache, self.model, [], is_internal=True, model_cache=self.model_cache
+        )
 
         # Init recursive files loading (with logs setup finalization callback to be called once project dir is known)
         NmkModelFile(
@@ -73,8 +94,12 @@ class NmkLoader:
                 },
                 memory_handler=self._logs_mem_handler,
             ),
+            model_cache=self.model_cache,
         )
 
+        # Persist parsed files for next time
+        self.model_cache.save()
+
         # Loop 1: load python paths
         for m in self.model.file_models.values():
             file_model: NmkModelFile = m
@@ -141,6 +166,13 @@ class NmkLoader:
         if with_logs:
             return logging_initial_setup(args)
 
+    def validate_classes(self):
+        # Load all config resolvers and task builders
+        NmkLogger.debug("Loading all classes for validation")
+        for m in self.model.file_models.values():
+            file_model: NmkModelFile = m
+            file_model.validate_classes()
+
     def validate_tasks(self):
         # Iterate on tasks: pass 1 --> resolve references
         for task in self.model.tasks.values():
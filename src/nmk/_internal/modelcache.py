@@ -0,0 +1,89 @@
+import copy
+import hashlib
+import os
+import pickle
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from nmk import __version__
+from nmk._internal.profile import profile_count
+from nmk.logs import NmkLogger
+
+# Cache format version (to be increased each time the persisted structure is changed); nmk version is also checked, as grammar may change
+_CACHE_VERSION = (1, __version__)
+
+
+class NmkModelCache:
+    """
+    Persistent cache for parsed + validated project files models
+
+    :param cache_file: persisted cache file path
+    :param copy_on_hit: return copies of cached models (for caches reused across several loadings)
+    """
+
+    def __init__(self, cache_file: Path, copy_on_hit: bool = False):
+        self.cache_file = cache_file
+        self.copy_on_hit = copy_on_hit
+        self._entries: dict[str, tuple[int, int, str, Any]] | None = None
+        self._dirty = False
+
+    @property
+    def entries(self) -> dict[str, tuple[int, int, str, Any]]:
+        # Lazy loading
+        if self._entries is None:
+            self._entries = {}
+            if self.cache_file.is_file():
+                try:
+                    with self.cache_file.open("rb") as f:
+                        version, entries = pickle.load(f)
+                    if version == _CACHE_VERSION:  # pragma: no branch
+                        self._entries = entries
+                except Exception as e:
+                    # Corrupted cache: just ignore it (will be rewritten)
+                    NmkLogger.debug(f"Ignoring invalid models cache ({self.cache_file}): {e}")
+        return self._entries
+
+    def load(self, file: Path, loader: Callable[[], Any]) -> Any:
+        """
+        Get file model from cache, or load it with provided loader if the file changed since cached
+
+        :param file: project file path
+        :param loader: project file loading function, used on cache miss
+        :return: loaded model
+        """
+
+        # Cache keys
+        st = file.stat()
+        digest = hashlib.sha256(file.read_bytes()).hexdigest()
+        key = str(file.resolve())
+
+        # Still the same file?
+        entry = self.entries.get(key)
+        if entry is not None and entry[:3] == (st.st_mtime_ns, st.st_size, digest):
+            NmkLogger.debug(lambda: f"Reusing cached model for {file}")
+            profile_count("models cache hits")
+            return copy.deepcopy(entry[3]) if self.copy_on_hit else entry[3]
+
+        # Load and remember
+        profile_count("models cache misses")
+        model = loader()
+        self.entries[key] = (st.st_mtime_ns, st.st_size, digest, model)
+        self._dirty = True
+        return copy.deepcopy(model) if self.copy_on_hit else model
+
+    def save(self):
+        """
+        Persist cache file, if updated
+        """
+
+        if self._dirty:
+            NmkLogger.debug(f"Saving models cache to {self.cache_file}")
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+            # Write to a temporary file first, to stay safe with concurrent nmk instances
+            tmp_file = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}")
+            with tmp_file.open("wb") as f:
+                pickle.dump((_CACHE_VERSION, self.entries), f)
+            tmp_file.replace(self.cache_file)
+            self._dirty = False
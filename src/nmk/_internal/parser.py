@@ -50,19 +50,29 @@ class NmkParser:
         ).completer = argcomplete.completers.FilesCompleter(directories=True)  # type: ignore
         lg.add_argument("--no-logs", action="store_true", default=False, help="disable logging")
         lg.add_argument("--log-prefix", metavar="PREFIX", default=None, help="prefix for all log messages")
+        lg.add_argument("--log-queue", action="store_true", default=False, help="write logs from a background thread")
 
         # Root folder
         rg = self.parser.add_argument_group("root folder options")
         rg.add_argument(
             "-r", "--root", metavar="R", type=Path, default=None, help="root folder (default: virtual env parent)"
         ).completer = argcomplete.completers.DirectoriesCompleter()  # type: ignore
-        rg.add_argument("--no-cache", action="store_true", default=False, help="clear cache before resolving references")
+        rg.add_argument(
+            "--no-cache",
+            action="store_true",
+            default=False,
+            help="clear cache folder before resolving references (including models cache, completion index and digests database)",
+        )
+        rg.add_argument("--refresh-refs", action="store_true", default=False, help="check if cached remote references changed, and download them again if so")
 
         # Project
         pg = self.parser.add_argument_group("project options")
         pg.add_argument(
             "-p", "--project", metavar="P", default="nmk.yml", help="project file (default: nmk.yml)"
         ).completer = argcomplete.completers.FilesCompleter(allowednames=["*.yml", "*.yaml"], directories=True)  # type: ignore
+        pg.add_argument(
+            "--validate", action="store_true", default=False, help="load all resolver and builder classes while loading project (default: on demand)"
+        )
 
         # Config
         cg = self.parser.add_argument_group("config options")
@@ -74,6 +84,29 @@ class NmkParser:
         bg.add_argument("--dry-run", action="store_true", default=False, help="list tasks to be executed and exit")
         bg.add_argument("--force", "-f", action="store_true", default=False, help="force tasks rebuild")
         bg.add_argument("--skip", dest="skipped_tasks", action="append", default=[], help="skip specified task").completer = TasksCompleter()  # type: ignore
+        bg.add_argument(
+            "--digests",
+            action="store_true",
+            default=False,
+            help="check inputs content digests (instead of modification times) to decide if tasks need a rebuild",
+        )
+        bg.add_argument("-j", "--jobs", metavar="N", type=int, default=1, help="build up to N independent tasks in parallel (default: 1)")
+        bg.add_argument(
+            "--profile",
+            action="store_true",
+            default=False,
+            help="record loading and build timings, then log a summary and write a trace file to {ROOTDIR_NMK}/profile.json",
+        )
+
+        # Daemon
+        dg = self.parser.add_argument_group("daemon options")
+        dg.add_argument(
+            "--daemon",
+            action="store_true",
+            default=False,
+            help="build through a background nmk server for the root folder (started if needed), keeping imported modules and parsed project files in memory between builds",
+        )
+        dg.add_argument("--stop-daemon", action="store_true", default=False, help="stop the background nmk server for the root folder, and exit")
 
         # Handle completion
         argcomplete.autocomplete(self.parser)
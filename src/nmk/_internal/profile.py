@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+"""
+Loading/build performance profiling
+"""
+
+# Current profiler (only set when profiling is enabled)
+_profiler: "NmkProfiler | None" = None
+
+# Span categories displayed in summary table (in this order), and whether all spans of a category are aggregated in a single row
+SUMMARY_CATEGORIES = {"phase": False, "load": False, "check": True, "task": False, "download": True, "pip": True}
+
+
+class NmkProfiler:
+    """
+    Records timed spans (wall + CPU time) and counters
+    """
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: list[tuple[str, str, int, float, float, float]] = []
+        """Recorded spans: name, category, thread ID, start time, wall duration, CPU duration (in seconds)"""
+        self.counters: dict[str, int] = {}
+        """Recorded counters"""
+
+    @contextmanager
+    def span(self, name: str, category: str) -> Iterator[None]:
+        # Record wall time + CPU time of current thread
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            cpu = time.thread_time() - cpu_start
+            wall = time.perf_counter() - start
+            with self._lock:
+                self.spans.append((name, category, threading.get_ident(), start - self._origin, wall, cpu))
+
+    def count(self, name: str, value: int = 1):
+        # Thread-safe increment
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> list[str]:
+        """
+        Build summary table lines
+
+        :return: summary lines
+        """
+
+        # Aggregate spans by category and name (keeping first occurrence order)
+        totals: dict[tuple[str, str], list[float]] = {}
+        for name, category, _, _, wall, cpu in sorted(filter(lambda s: s[1] in SUMMARY_CATEGORIES, self.spans), key=lambda s: s[3]):
+            total = totals.setdefault((category, "(all)" if SUMMARY_CATEGORIES[category] else name), [0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += wall
+            total[2] += cpu
+        name_len = max([len(n) for _, n in totals] + [4])
+        lines = [f"{'Category':<10} {'Name':<{name_len}} {'Count':>6} {'Wall (ms)':>10} {'CPU (ms)':>10}"]
+        for category in SUMMARY_CATEGORIES:
+            for (c, name), (count, wall, cpu) in filter(lambda t: t[0][0] == category, totals.items()):
+                lines.append(f"{c:<10} {name:<{name_len}} {count:>6} {wall * 1000:>10.1f} {cpu * 1000:>10.1f}")
+
+        # Counters
+        lines.extend(f"{name}: {value}" for name, value in sorted(self.counters.items()))
+        return lines
+
+    def save_trace(self, trace_file: Path):
+        """
+        Write spans and counters to a Chrome trace file (can be loaded in chrome://tracing or https://ui.perfetto.dev)
+
+        :param trace_file: output trace file path
+        """
+        pid = os.getpid()
+        tids: dict[int, int] = {}
+        events = []
+        for name, category, ident, start, wall, cpu in self.spans:
+            tid = tids.setdefault(ident, len(tids))
+            events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": round(start * 1e6, 1),
+                    "dur": round(wall * 1e6, 1),
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"cpu_ms": round(cpu * 1000, 3)},
+                }
+            )
+        events.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": f"thread-{tid}"}} for tid in tids.values())
+        trace_file.parent.mkdir(parents=True, exist_ok=True)
+        trace_file.write_text(json.dumps({"traceEvents": events, "otherData": {"counters": self.counters}}, indent=1), encoding="utf-8")
+
+
+def start_profiling() -> NmkProfiler:
+    """
+    Enable profiling
+
+    :return: profiler instance
+    """
+    global _profiler
+    _profiler = NmkProfiler()
+    return _profiler
+
+
+def stop_profiling():
+    """
+    Disable profiling
+    """
+    global _profiler
+    _profiler = None
+
+
+@contextmanager
+def profile_span(name: str, category: str) -> Iterator[None]:
+    """
+    Record a timed span, if profiling is enabled
+
+    :param name: span name
+    :param category: span category
+    """
+    if _profiler is None:
+        yield
+    else:
+        with _profiler.span(name, category):
+            yield
+
+
+def profile_count(name: str, value: int = 1):
+    """
+    Increment a counter, if profiling is enabled
+
+    :param name: counter name
+    :param value: increment value
+    """
+    if _profiler is not None:
+        _profiler.count(name, value)
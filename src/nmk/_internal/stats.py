@@ -0,0 +1,71 @@
+import os
+import stat
+import threading
+from pathlib import Path
+
+
+class NmkStatCache:
+    """
+    Build-scoped cache of files stats, to stat each path only once
+    """
+
+    def __init__(self):
+        self._stats: dict[Path, os.stat_result | None] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        """Number of stats served from cache"""
+        self.misses = 0
+        """Number of stats really performed"""
+
+    def stat(self, p: Path) -> os.stat_result | None:
+        """
+        Get path stat result
+
+        :param p: path to be checked
+        :return: stat result, or None if path doesn't exist
+        """
+
+        # Already known?
+        with self._lock:
+            if p in self._stats:
+                self.hits += 1
+                return self._stats[p]
+
+        # Stat it and remember
+        try:
+            st = p.stat()
+        except OSError:
+            st = None
+        with self._lock:
+            self.misses += 1
+            self._stats[p] = st
+        return st
+
+    def exists(self, p: Path) -> bool:
+        """
+        Check if path exists
+
+        :param p: path to be checked
+        :return: True if path exists
+        """
+        return self.stat(p) is not None
+
+    def is_file(self, p: Path) -> bool:
+        """
+        Check if path is an existing file
+
+        :param p: path to be checked
+        :return: True if path is a file
+        """
+        st = self.stat(p)
+        return st is not None and stat.S_ISREG(st.st_mode)
+
+    def invalidate(self, paths: list[Path]):
+        """
+        Forget stats for provided paths (e.g. outputs of a task that has just been built)
+
+        :param paths: paths to be stat'ed again on next access
+        """
+        with self._lock:
+            for p in paths:
+                self._stats.pop(p, None)
@@ -0,0 +1,45 @@
+import time
+from pathlib import Path
+from typing import Any
+
+from nmk.logs import NmkLogger
+
+"""
+YAML files loading, with the fastest available backend
+"""
+
+
+def _loaders() -> tuple[type, type]:
+    import yaml
+
+    # libyaml based loader if available (same constructor as the pure python one, but with a C parser)
+    pure_loader = yaml.FullLoader
+    return getattr(yaml, "CFullLoader", pure_loader) if yaml.__with_libyaml__ else pure_loader, pure_loader
+
+
+def load_yaml(file: Path, fast: bool = True) -> Any:
+    """
+    Load YAML file content
+
+    :param file: YAML file path
+    :param fast: use libyaml based loader, if available (otherwise pure python one)
+    :return: loaded content
+    """
+    import yaml
+
+    fast_loader, pure_loader = _loaders()
+    loader = fast_loader if fast else pure_loader
+    start = time.perf_counter()
+    try:
+        with file.open() as f:
+            out = yaml.load(f, Loader=loader)
+    except yaml.YAMLError:
+        if loader is pure_loader:
+            raise
+
+        # Parse again with pure python loader, to get the same (detailed) error message whatever is the backend
+        loader = pure_loader
+        with file.open() as f:
+            out = yaml.load(f, Loader=loader)
+    NmkLogger.debug(lambda: f"Parsed {file} in {(time.perf_counter() - start) * 1000:.1f}ms (with {loader.__name__})")
+    return out
@@ -1,10 +1,13 @@
+import atexit
 import logging
 import logging.handlers
+import queue
 from argparse import Namespace
+from collections.abc import Callable
+from functools import cache
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
-import coloredlogs
 from rich.emoji import Emoji
 from rich.text import Text
 
@@ -21,63 +24,92 @@ LOG_FORMAT = "%(asctime)s (%(levelname).1s) %(prefix)s%(name)s %(message)s"
 LOG_FORMAT_DEBUG = "%(asctime)s.%(msecs)03d (%(levelname).1s) %(prefix)s%(name)s %(message)s - %(filename)s:%(funcName)s:%(lineno)d"
 """File logs format"""
 
+# Logs date format (same as coloredlogs default one)
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
 # One megabyte
 _ONE_MB = 1024 * 1024
 
 
+# Message type: either a string, or a callable returning it (only invoked if the message is really logged)
+LogMessage = str | Callable[[], str]
+
+
+@cache
+def _render_emoji(emoji: str) -> str:
+    # Rendered emoji string, for a given emoji code
+    return str(Emoji(emoji))
+
+
 class NmkLogWrapper:
     """
     Wrapped logger, handling logs with emojis!
 
+    Logged messages can be provided as callables, which are only invoked if the message level is enabled.
+
     :param logger: logger instance to be wrapped
     """
 
     def __init__(self, logger: logging.Logger):
         self._logger = logger
 
-    def __log(self, level: int, emoji: str | Emoji | Text, line: str):
-        self._logger.log(level, f"{Emoji(emoji) if isinstance(emoji, str) else emoji} - {line}", stacklevel=3)
+    def __log(self, level: int, emoji: str | Emoji | Text, line: LogMessage):
+        # Nothing to do if level is disabled
+        if not self._logger.isEnabledFor(level):
+            return
+        if callable(line):
+            line = line()
+        self._logger.log(level, f"{_render_emoji(emoji) if isinstance(emoji, str) else emoji} - {line}", stacklevel=3)
+
+    def isEnabledFor(self, level: int) -> bool:
+        """
+        Check if messages on required level will be logged
+
+        :param level: log level
+        :return: True if level is enabled
+        """
+        return self._logger.isEnabledFor(level)
 
-    def log(self, level: int, emoji: str, line: str):
+    def log(self, level: int, emoji: str, line: LogMessage):
         """
         Log provided message string + emoji, on required level
 
         :param level: log level
         :param emoji: emoji code or format string
-        :param line: message string to be logged
+        :param line: message string to be logged (or callable returning it)
         """
         self.__log(level, emoji, line)
 
-    def info(self, emoji: str, line: str):
+    def info(self, emoji: str, line: LogMessage):
         """
         Log provided message string + emoji, on INFO level
 
         :param emoji: emoji code or format string
-        :param line: message string to be logged
+        :param line: message string to be logged (or callable returning it)
         """
         self.__log(logging.INFO, emoji, line)
 
-    def debug(self, line: str):
+    def debug(self, line: LogMessage):
         """
         Log provided message string (with default emoji), on DEBUG level
 
-        :param line: message string to be logged
+        :param line: message string to be logged (or callable returning it)
         """
         self.__log(logging.DEBUG, "bug", line)
 
-    def error(self, line: str):
+    def error(self, line: LogMessage):
         """
         Log provided message string (with default emoji), on ERROR level
 
-        :param line: message string to be logged
+        :param line: message string to be logged (or callable returning it)
         """
         self.__log(logging.ERROR, "skull", line)
 
-    def warning(self, line: str):
+    def warning(self, line: LogMessage):
         """
         Log provided message string (with default emoji), on WARNING level
 
-        :param line: message string to be logged
+        :param line: message string to be logged (or callable returning it)
         """
         self.__log(logging.WARNING, "exclamation", line)
 
@@ -85,6 +117,38 @@ class NmkLogWrapper:
 NmkLogger = NmkLogWrapper(logging.getLogger("nmk"))
 """Root logger instance"""
 
+# Background logs writer (when enabled)
+_queue_listener: logging.handlers.QueueListener | None = None
+
+
+def _start_queue_listener():
+    # Move all root handlers to a background listener, and only keep a queue handler on root logger
+    global _queue_listener
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handlers = list(logging.root.handlers)
+    for handler in handlers:
+        logging.root.removeHandler(handler)
+    logging.root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+
+
+def _stop_queue_listener():
+    # Write all pending records, then restore handlers on root logger
+    global _queue_listener
+    if _queue_listener is None:
+        return
+    listener, _queue_listener = _queue_listener, None
+    listener.stop()
+    for handler in filter(lambda h: isinstance(h, logging.handlers.QueueHandler), list(logging.root.handlers)):
+        logging.root.removeHandler(handler)
+    for handler in listener.handlers:
+        logging.root.addHandler(handler)
+
+
+# Make sure pending records are written on exit
+atexit.register(_stop_queue_listener)
+
 
 def logging_initial_setup(args: Namespace) -> logging.handlers.MemoryHandler | None:
     """
@@ -95,6 +159,7 @@ def logging_initial_setup(args: Namespace) -> logging.handlers.MemoryHandler | N
     """
 
     # Setup logging (if not disabled)
+    _stop_queue_listener()
     mem_handler = None
     if not args.no_logs:
         # Basic init, with memory handler (to be flushed later)
@@ -103,12 +168,21 @@ def logging_initial_setup(args: Namespace) -> logging.handlers.MemoryHandler | N
         logging.getLogger().addHandler(mem_handler)
 
         # Colored logs install
+        import coloredlogs
+
         coloredlogs.install(level=args.log_level, fmt=LOG_FORMAT if args.log_level > logging.DEBUG else LOG_FORMAT_DEBUG)
 
+        # Without log file, messages below displayed level are never written: skip them as early as possible
+        if not args.log_file:
+            logging.root.setLevel(args.log_level)
+
         # Add prefix keyword if configured
         used_logs_prefix = (args.log_prefix + " ") if args.log_prefix else ""
         _old_record_factory = logging.getLogRecordFactory()
 
+        # Don't stack prefix factories when setup is done several times in the same process
+        _old_record_factory = getattr(_old_record_factory, "nmk_wrapped", _old_record_factory)
+
         def _prefixed_log_record_factory(*p_args, **kw_args) -> logging.LogRecord:
             """
             Custom log record factory to add prefix
@@ -117,8 +191,13 @@ def logging_initial_setup(args: Namespace) -> logging.handlers.MemoryHandler | N
             record.prefix = used_logs_prefix
             return record
 
+        _prefixed_log_record_factory.nmk_wrapped = _old_record_factory  # type: ignore
         logging.setLogRecordFactory(_prefixed_log_record_factory)
 
+        # Write logs from a background thread, if required
+        if args.log_queue:
+            _start_queue_listener()
+
     # First log line
     NmkLogger.debug(f"----- nmk version {__version__} -----")
     NmkLogger.debug(f"called with args: {args}")
@@ -151,19 +230,30 @@ def logging_finalize_setup(log_file_str: str, model_paths_keywords: dict[str, st
         # No logs to write, just return
         return
 
+    # Pause background writer (if any) while swapping handlers, so that each record goes either to memory handler or to file handler
+    restart_listener = _queue_listener is not None
+    _stop_queue_listener()
+
+    file_handler = None
     if log_file_str:
         # Handle output log file (generate it from pattern, and create parent folder if needed)
         log_file = _build_logfile_path(log_file_str, model_paths_keywords)
         log_file.parent.mkdir(parents=True, exist_ok=True)
         file_handler = RotatingFileHandler(log_file, maxBytes=_ONE_MB, backupCount=5, encoding="utf-8")
-        file_handler.setFormatter(logging.Formatter(LOG_FORMAT_DEBUG, datefmt=coloredlogs.DEFAULT_DATE_FORMAT))
-        logging.root.addHandler(file_handler)
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT_DEBUG, datefmt=_DATE_FORMAT))
 
         # Provide log file handler to pending memory handler
         memory_handler.setTarget(file_handler)
 
-    # Just close the memory handler to flush pending logs
+    # Just close the memory handler to flush pending logs, then write next ones to file
     memory_handler.close()
+    logging.root.removeHandler(memory_handler)
+    if file_handler is not None:
+        logging.root.addHandler(file_handler)
+
+    # Resume background writer
+    if restart_listener:
+        _start_queue_listener()
 
 
 def logging_shutdown(args: Namespace, model_keywords: dict[str, str]):
@@ -176,6 +266,9 @@ def logging_shutdown(args: Namespace, model_keywords: dict[str, str]):
 
     log_file = _build_logfile_path(args.log_file, model_keywords)
 
+    # Wait for background writer, if any
+    _stop_queue_listener()
+
     for handler in logging.root.handlers:
         # Flush all anyway
         handler.flush()
@@ -9,15 +9,17 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
+from nmk._internal.profile import profile_count
 from nmk.model.keys import NmkRootConfig
 
 CONFIG_REF_PATTERN = re.compile(r"(^|[^$])(\$\{([^ \}]+)\})")
 """Pattern to locate config reference in string"""
 
+CONFIG_REF_TEMPLATE_PATTERN = re.compile(r"(?<!\$)\$\{([^ \}]+)\}")
+"""Pattern to split string in literal and config reference segments"""
+
 # Group indexes for config refs
 _CONFIG_REF_FULL = 0
-_CONFIG_REF_PREFIX = 1
-_CONFIG_REF_TO_REPLACE = 2
 _CONFIG_REF_NAME = 3
 
 # Escaped reference prefix
@@ -30,11 +32,8 @@ ConfigTypes = str | int | bool | list[Any] | dict[str, Any]
 """Used config item types"""
 
 
-# Compute reference name (+doted segments) from config reference
-def _get_ref_name(m: re.Match, name: str, model) -> tuple[str, bool, list[str]]:
-    # Look for referenced config item name
-    ref_name: str = m.group(_CONFIG_REF_NAME)
-
+# Split config reference in name, relative path option and doted segments
+def _parse_ref(ref_name: str) -> tuple[str, bool, list[str] | None]:
     # Relative path reference
     relative_path = ref_name.startswith("r!")
     if relative_path:
@@ -47,12 +46,78 @@ def _get_ref_name(m: re.Match, name: str, model) -> tuple[str, bool, list[str]]:
     else:
         segments = None
 
+    return ref_name, relative_path, segments
+
+
+# Compute reference name (+doted segments) from config reference
+def _get_ref_name(m: re.Match, name: str, model) -> tuple[str, bool, list[str]]:
+    # Look for referenced config item name
+    ref_name, relative_path, segments = _parse_ref(m.group(_CONFIG_REF_NAME))
+
     # Resolve from config
     assert ref_name in model.config, f"Unknown '{ref_name}' config referenced from '{name}' config"
 
     return ref_name, relative_path, segments
 
 
+@dataclass(frozen=True)
+class _NmkConfigRef:
+    # Config reference segment in a compiled string template
+    text: str
+    name: str
+    relative_path: bool
+    segments: tuple[str, ...] | None
+
+
+@dataclass(frozen=True)
+class _NmkTemplate:
+    # Compiled string template, with literal and config reference segments
+    source: str
+    segments: tuple[str | _NmkConfigRef, ...]
+
+
+# Compile string in a list of literal and config reference segments
+def _compile_template(value: str) -> tuple[str | _NmkConfigRef, ...]:
+    out: list[str | _NmkConfigRef] = []
+    pos = 0
+    for m in CONFIG_REF_TEMPLATE_PATTERN.finditer(value):
+        if m.start() > pos:
+            out.append(value[pos : m.start()])
+        ref_name, relative_path, segments = _parse_ref(m.group(1))
+        out.append(_NmkConfigRef(m.group(0), ref_name, relative_path, tuple(segments) if segments is not None else None))
+        pos = m.end()
+    if pos < len(value):
+        out.append(value[pos:])
+    return tuple(out)
+
+
+# Compile value: strings containing config references are replaced by templates (recursively in lists and dicts)
+def _compile_value(candidate: Any) -> Any:
+    if isinstance(candidate, list):
+        return [_compile_value(c) for c in candidate]
+    if isinstance(candidate, dict):
+        return {_compile_value(k): _compile_value(v) for k, v in candidate.items()}
+    if isinstance(candidate, str) and "${" in candidate:
+        segments = _compile_template(candidate)
+        if any(isinstance(s, _NmkConfigRef) for s in segments):
+            return _NmkTemplate(candidate, segments)
+    return candidate
+
+
+# Find all config item names referenced from a compiled value (recursively in lists and dicts)
+def _find_references(compiled: Any, out: set[str]) -> set[str]:
+    if isinstance(compiled, list):
+        for c in compiled:
+            _find_references(c, out)
+    elif isinstance(compiled, dict):
+        for k, v in compiled.items():
+            _find_references(k, out)
+            _find_references(v, out)
+    elif isinstance(compiled, _NmkTemplate):
+        out.update(s.name for s in compiled.segments if isinstance(s, _NmkConfigRef) and s.name != NmkRootConfig.BASE_DIR)
+    return out
+
+
 @dataclass
 class NmkConfig(ABC):
     """
@@ -75,6 +140,13 @@ class NmkConfig(ABC):
         """
         return FINAL_ITEM_PATTERN.match(self.name) is not None
 
+    @property
+    def references(self) -> set[str]:
+        """
+        Names of the config items referenced by this item
+        """
+        return set()
+
     @property
     def value(self) -> ConfigTypes:
         """
@@ -91,8 +163,11 @@ class NmkConfig(ABC):
         :return: resolved item value
         """
 
+        # Overridden item type check may be pending
+        self._check_override()
+
         # Check for volatile item
-        is_volatile = self.volatile if hasattr(self, "volatile") else False
+        is_volatile = getattr(self, "volatile", False)
 
         # Check for cached value
         cached_value = self.cached_value if hasattr(self, "cached_value") else None
@@ -100,6 +175,7 @@ class NmkConfig(ABC):
         # Check for cached value
         if not cache or cached_value is None or is_volatile:
             # Get value from implementation
+            profile_count("config items resolutions")
             out = self._get_value(cache, resolved_from)
 
             # Cache resolved value? (unless volatile)
@@ -111,74 +187,110 @@ class NmkConfig(ABC):
 
         return out
 
+    def invalidate(self):
+        """
+        Forget cached value (if any), so that it is resolved again on next access
+        """
+        self.cached_value = None
+
+    def _defer_override_check(self, check: Callable[[], None]):
+        # Remember type check against overridden item, to be done on first value or type access
+        self._override_check = check
+
+    def _check_override(self):
+        # Run pending type check (only once)
+        check = getattr(self, "_override_check", None)
+        if check is not None:
+            self._override_check = None
+            check()
+
     # Process item references
     def _format(self, cache: bool, candidate: ConfigTypes, resolved_from: set[str] | None = None, path: Path | None = None) -> ConfigTypes:
-        resolved_from = set(resolved_from) if resolved_from is not None else set()
+        # Resolution chain is shared along the recursion: add current item only once, and remove it when done
+        resolved_from = resolved_from if resolved_from is not None else set()
+        if self.name in resolved_from:
+            return self._format_candidate(cache, candidate, resolved_from, path)
         resolved_from.add(self.name)
+        try:
+            return self._format_candidate(cache, candidate, resolved_from, path)
+        finally:
+            resolved_from.remove(self.name)
 
+    # Process item references, in an already started resolution chain
+    def _format_candidate(self, cache: bool, candidate: ConfigTypes, resolved_from: set[str], path: Path | None) -> ConfigTypes:
         # Map dicts and lists
         if isinstance(candidate, list):
             return [self._format(cache, c, resolved_from, path) for c in candidate]
         if isinstance(candidate, dict):
             return {self._format(cache, k, resolved_from, path): self._format(cache, v, resolved_from, path) for k, v in candidate.items()}
-        if not isinstance(candidate, str):
+
+        # Strings not compiled yet (e.g. returned by resolvers)
+        if isinstance(candidate, str):
+            candidate = _compile_value(candidate)
+        if isinstance(candidate, _NmkTemplate):
+            # Evaluate template segments
+            parts: list[str] = []
+            last = len(candidate.segments) - 1
+            for i, segment in enumerate(candidate.segments):
+                if isinstance(segment, str):
+                    parts.append(segment)
+                    continue
+                ref_value = self._resolve_ref(cache, segment, resolved_from, path)
+                if i == last and not isinstance(ref_value, str) and sum(map(len, parts)) <= 1:
+                    # Stop here, with raw non-string value (reference is the whole string, possibly with a single char prefix)
+                    return ref_value
+                parts.append(str(ref_value))
+            candidate = "".join(parts)
+        elif not isinstance(candidate, str):
             # Nothing to format
             return candidate
 
-        # Iterate on <xxx> references
-        m = True
-        to_format = candidate
-        while m is not None:
-            m = CONFIG_REF_PATTERN.search(to_format)
-            if m is not None:
-                # Look for referenced config item name, and potential doted segments + relative path option
-                ref_name, relative_path, segments = _get_ref_name(m, self.name, self.model)
-
-                if ref_name == NmkRootConfig.BASE_DIR:
-                    # Resolve current path
-                    ref_value = str(path if path is not None else self.path)
+        # Return formatted value (handling escaped prefix only if resolving at top level)
+        return candidate.replace(_ESCAPED_REF_PREFIX, "${") if (len(resolved_from) == 1) else candidate
+
+    # Resolve a reference segment
+    def _resolve_ref(self, cache: bool, ref: _NmkConfigRef, resolved_from: set[str], path: Path | None) -> ConfigTypes:
+        # Referenced config item must exist
+        ref_name = ref.name
+        assert ref_name in self.model.config, f"Unknown '{ref_name}' config referenced from '{self.name}' config"
+
+        if ref_name == NmkRootConfig.BASE_DIR:
+            # Resolve current path
+            ref_value = str(path if path is not None else self.path)
+        else:
+            # Check for cyclic reference
+            assert ref_name not in resolved_from, f"Cyclic string substitution: resolving (again!) '{ref_name}' config from '{self.name}' config"  # NOQA:B028
+
+            # Resolve reference from config
+            ref_value = self.model.config[ref_name].resolve(cache, resolved_from)
+
+            # Doted reference?
+            if ref.segments is not None:
+                # Iterate on segments as long as we get dicts
+                v = ref_value
+                for segment in ref.segments[1:]:
+                    assert isinstance(v, dict), f"Doted reference from {self.name} used for {ref_name} value, which is not a dict"
+                    assert len(segment), f"Empty doted reference segment from {self.name} for {ref_name} value"
+                    assert segment in v, f"Unknown dict key {segment} in doted reference from {self.name} for {ref_name} value"
+                    v = v[segment]
+                ref_value = v
+
+        # Relative path required?
+        if ref.relative_path:
+            try:
+                # Update path(s) relatively to project root
+                p_dir = self.model.config[NmkRootConfig.PROJECT_DIR].value
+                if isinstance(ref_value, list):
+                    ref_value = [Path(v).relative_to(p_dir).as_posix() for v in ref_value]
+                elif isinstance(ref_value, dict):
+                    ref_value = {k: Path(v).relative_to(p_dir).as_posix() for k, v in ref_value.items()}
                 else:
-                    # Check for cyclic reference
-                    assert ref_name not in resolved_from, f"Cyclic string substitution: resolving (again!) '{ref_name}' config from '{self.name}' config"  # NOQA:B028
-
-                    # Resolve reference from config
-                    ref_value = self.model.config[ref_name].resolve(cache, resolved_from)
-
-                    # Doted reference?
-                    if segments is not None:
-                        # Iterate on segments as long as we get dicts
-                        v = ref_value
-                        for segment in segments[1:]:
-                            assert isinstance(v, dict), f"Doted reference from {self.name} used for {ref_name} value, which is not a dict"
-                            assert len(segment), f"Empty doted reference segment from {self.name} for {ref_name} value"
-                            assert segment in v, f"Unknown dict key {segment} in doted reference from {self.name} for {ref_name} value"
-                            v = v[segment]
-                        ref_value = v
-
-                # Relative path required?
-                if relative_path:
-                    try:
-                        # Update path(s) relatively to project root
-                        p_dir = self.model.config[NmkRootConfig.PROJECT_DIR].value
-                        if isinstance(ref_value, list):
-                            ref_value = [Path(v).relative_to(p_dir).as_posix() for v in ref_value]
-                        elif isinstance(ref_value, dict):
-                            ref_value = {k: Path(v).relative_to(p_dir).as_posix() for k, v in ref_value.items()}
-                        else:
-                            ref_value = Path(ref_value).relative_to(p_dir).as_posix()
-                    except ValueError as e:
-                        # Invalid relative reference
-                        raise AssertionError(f"Invalid relative path reference: {m.group(0)}") from e
-
-                # Replace with resolved value
-                begin, end = m.span(_CONFIG_REF_TO_REPLACE)
-                if m.group(_CONFIG_REF_FULL) == to_format and not isinstance(ref_value, str):
-                    # Stop here, with raw non-string value
-                    return ref_value
-                to_format = to_format[0:begin] + str(ref_value) + to_format[end:]
+                    ref_value = Path(ref_value).relative_to(p_dir).as_posix()
+            except ValueError as e:
+                # Invalid relative reference
+                raise AssertionError(f"Invalid relative path reference: {ref.text}") from e
 
-        # Return formatted value (handling escaped prefix only if resolving at top level)
-        return to_format.replace(_ESCAPED_REF_PREFIX, "${") if (len(resolved_from) == 1) else to_format
+        return ref_value
 
     @abstractmethod
     def _get_value(self, cache: bool, resolved_from: set[str] | None = None) -> ConfigTypes:  # pragma: no cover
@@ -213,6 +325,10 @@ class NmkStaticConfig(NmkConfig):
     def __post_init__(self):
         # Detect value type once for all
         self._type: type[Any] = type(self.static_value)
+        self._type_ref: str | None = None
+
+        # Compile value templates once for all, and remember referenced items
+        self._compile()
 
         # Specific handling for string items
         if isinstance(self.static_value, str):
@@ -223,13 +339,29 @@ class NmkStaticConfig(NmkConfig):
                 # Check for reference
                 m = CONFIG_REF_PATTERN.match(self.static_value)
                 if m is not None and m.group(_CONFIG_REF_FULL) == self.static_value:
-                    # Value is actually a simple reference: use referenced item type
+                    # Value is actually a simple reference: use referenced item type (evaluated on demand)
                     ref_name, _, _ = _get_ref_name(m, self.name, self.model)
-                    self._type = self.model.config[ref_name].value_type
+                    self._type_ref = ref_name
+
+    def _compile(self):
+        self._compiled_source = self.static_value
+        self._compiled = _compile_value(self.static_value)
+        self._references = _find_references(self._compiled, set())
 
     def _get_value(self, cache: bool, resolved_from: set[str] | None = None) -> ConfigTypes:
-        # Simple static value
-        return self._format(cache, self.static_value, resolved_from)
+        # Static value may have been updated since compiled
+        if self._compiled_source is not self.static_value:
+            self._compile()
+        return self._format(cache, self._compiled, resolved_from)
+
+    @property
+    def references(self) -> set[str]:
+        """
+        Names of the config items referenced by this static item
+
+        :return: set of referenced names
+        """
+        return self._references
 
     @property
     def value_type(self) -> type[Any]:
@@ -239,6 +371,13 @@ class NmkStaticConfig(NmkConfig):
         :return: value type
         """
 
+        # Overridden item type check may be pending
+        self._check_override()
+
+        # Simple reference: get type from referenced item
+        if self._type_ref is not None:
+            self._type = self.model.config[self._type_ref].value_type
+            self._type_ref = None
         return self._type
 
 
@@ -251,6 +390,15 @@ class NmkMergedConfig(NmkConfig):
     static_list: list[NmkStaticConfig] = field(default_factory=list[NmkStaticConfig])
     """List of merged static items"""
 
+    @property
+    def references(self) -> set[str]:
+        """
+        Names of the config items referenced by all merged items
+
+        :return: set of referenced names
+        """
+        return set().union(*(holder.references for holder in self.static_list))
+
     def traverse_list(self, items: list, out_list: list, cache: bool, resolved_from: set[str], holder):
         """
         Recursive list resolution
@@ -314,6 +462,7 @@ class NmkListConfig(NmkMergedConfig):
 
         :return: list type
         """
+        self._check_override()
         return list
 
 
@@ -337,6 +486,7 @@ class NmkDictConfig(NmkMergedConfig):
 
         :return: dict type
         """
+        self._check_override()
         return dict
 
 
@@ -346,27 +496,56 @@ class NmkResolvedConfig(NmkConfig):
     Resolved config item class
     """
 
-    resolver: Callable
-    """Config resolver instance for this item"""
+    _resolver: Callable = field(repr=False, compare=False)
 
     params: NmkDictConfig
     """Resolver parameters"""
 
-    def resolve(self, cache: bool = True, resolved_from: set[str] = None) -> str | int | bool | list | dict:
+    resolver_loader: Callable[[], Callable] | None = None
+    """Config resolver loader, invoked on first access to resolver instance"""
+
+    def __post_init__(self):
+        # Value type, asked to resolver on demand
+        self._type: type[Any] | None = None
+
+    @property
+    def resolver(self) -> Callable:
+        """Config resolver instance for this item (when loaded on demand, imported and instantiated on first access)"""
+
+        # Load resolver on first access, if not set yet
+        if self._resolver is None and self.resolver_loader is not None:
+            self._resolver = self.resolver_loader()
+        return self._resolver
+
+    @resolver.setter
+    def resolver(self, resolver: Callable):
+        self._resolver = resolver
+
+    @property
+    def volatile(self) -> bool:
         """
-        Resolves item value (with disabled cache if resolver is volatile)
+        Disable cache for this item if resolver is volatile
 
-        :param cache: use cached value, if already resolved
-        :param resolved_from: set of item names referencing this item
-        :return: resolved item value
+        :return: True if resolver is volatile
         """
-        return super().resolve(cache and not self.resolver.is_volatile(self.name), resolved_from)
+        return self.resolver.is_volatile(self.name)
+
+    @property
+    def references(self) -> set[str]:
+        """
+        Names of the config items referenced by the resolver parameters
+
+        :return: set of referenced names
+        """
+        return self.params.references if self.params is not None else set()
 
     def _get_value(self, cache: bool, resolved_from: set[str] = None) -> str | int | bool | list | dict:
+        # Resolver loading errors are reported as is
+        resolver = self.resolver
         try:
             # Cache value from resolver if not done yet, or redo if value is declared to be volatile
             params = self.params.value if self.params is not None else {}
-            out = self.resolver.get_value(self.name, **params)
+            out = resolver.get_value(self.name, **params)
 
             # Make sure the resolver has returned expected type
             got_type = type(out)
@@ -383,8 +562,15 @@ class NmkResolvedConfig(NmkConfig):
 
         :return: value type
         """
-        try:
-            # Ask resolver for value type
-            return self.resolver.get_type(self.name)
-        except Exception as e:
-            raise Exception(f"Error occurred while getting type for config {self.name}: {e}") from e
+        # Overridden item type check may be pending
+        self._check_override()
+
+        if self._type is None:
+            # Resolver loading errors are reported as is
+            resolver = self.resolver
+            try:
+                # Ask resolver for value type (only once)
+                self._type = resolver.get_type(self.name)
+            except Exception as e:
+                raise Exception(f"Error occurred while getting type for config {self.name}: {e}") from e
+        return self._type
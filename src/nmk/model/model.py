@@ -6,28 +6,38 @@ import importlib
 import importlib.abc
 import importlib.util
 import sys
+import threading
 from argparse import Namespace
 from collections.abc import Callable
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, cast
 
-from nmk.envbackend import EnvBackend, EnvBackendFactory
 from nmk.logs import NmkLogger
 from nmk.model.config import NmkConfig, NmkDictConfig, NmkListConfig, NmkResolvedConfig, NmkStaticConfig
+from nmk.model.keys import NmkRootConfig
 from nmk.model.task import NmkTask
 
+if TYPE_CHECKING:  # pragma: no cover
+    from nmk.envbackend import EnvBackend
+
 # Class separator
 _CLASS_SEP = "."
 
+# Contributed modules import lock (classes may be loaded on demand from parallel build threads)
+_import_lock = threading.RLock()
+
 
 @dataclass
 class _NmkPathFinder(importlib.abc.MetaPathFinder):
-    # Dict of contributed files from nmk files
-    _path_contribs: dict[str, Path] = field(default_factory=dict[str, Path])
+    # List of contributed paths from nmk files
+    _paths: list[Path] = field(default_factory=list[Path])
+
+    # Module files lookups cache (including negative ones)
+    _lookups: dict[str, Path | None] = field(default_factory=dict[str, Path | None])
 
     # Remember if a file has already been contributed through this finder
-    _path_found: dict[str, Path] = field(default_factory=dict[str, Path])
+    _path_found: set[str] = field(default_factory=set[str])
 
     # Remember if this finder has been added to the import system
     _registered: bool = False
@@ -36,44 +46,61 @@ class _NmkPathFinder(importlib.abc.MetaPathFinder):
         # Check if path:
         # * is a contributed one
         # * has not be found yet by this finder
-        if (fullname in self._path_found) and not self._path_found[fullname]:
-            # Custom loading of this module
-            spec = self.find_spec(fullname, None)
-            mod = importlib.util.module_from_spec(spec)
+        # (serialized: concurrent callers wait for the module to be fully executed)
+        with _import_lock:
+            if (fullname not in self._path_found) and self._lookup(fullname) is not None:
+                # Custom loading of this module
+                spec = self.find_spec(fullname, None)
+                mod = importlib.util.module_from_spec(spec)
 
-            # Override cache for this module
-            sys.modules[fullname] = mod
-            spec.loader.exec_module(mod)
-            return mod
+                # Override cache for this module
+                sys.modules[fullname] = mod
+                spec.loader.exec_module(mod)
+                return mod
 
-        # Default import
-        return importlib.import_module(fullname)
+            # Default import
+            return importlib.import_module(fullname)
 
     def contribute_path(self, paths: list[Path]):
         # Contribute to internal paths list
         added_paths = [x.resolve() for x in paths]
-        NmkLogger.debug(f"Contributed python paths: {added_paths}")
+        NmkLogger.debug(lambda: f"Contributed python paths: {added_paths}")
         for added_path in added_paths:
             # Path must be a directory
             assert added_path.is_dir(), f"Contributed python path is not found: {added_path}"
+            self._paths.append(added_path)
 
-            # Remember all found python files
-            for f in added_path.rglob("*.py"):
-                # Build module name (remove py extension; also remove __init__ for packages)
-                name = _CLASS_SEP.join(list(f.relative_to(added_path).parts)).removesuffix(".py").removesuffix(".__init__")
-                self._path_contribs[name] = f
-                self._path_found[name] = False
+            # Previous lookups may be outdated with this new path
+            self._lookups.clear()
 
             # A new path has been contributed, register in import system
             if not self._registered:  # pragma: no branch
                 self._registered = True
                 sys.meta_path.append(self)
 
+    def _lookup(self, fullname: str) -> Path | None:
+        # Already looked for?
+        if fullname in self._lookups:
+            return self._lookups[fullname]
+
+        # Probe module file in contributed paths (latest contributed ones first)
+        found = None
+        relative_path = Path(*fullname.split(_CLASS_SEP))
+        for contributed_path in reversed(self._paths):
+            for candidate in (contributed_path / relative_path / "__init__.py", contributed_path / relative_path.with_name(relative_path.name + ".py")):
+                if candidate.is_file():
+                    found = candidate
+                    break
+            if found is not None:
+                break
+        self._lookups[fullname] = found
+        return found
+
     def find_spec(self, fullname: str, path: str | None, target: object | None = None):
-        # Find in contributes files
-        found_path = self._path_contribs.get(fullname, None)
-        if found_path:  # pragma: no branch
-            self._path_found[fullname] = True
+        # Find in contributed paths
+        found_path = self._lookup(fullname)
+        if found_path is not None:
+            self._path_found.add(fullname)
             return importlib.util.spec_from_file_location(fullname, found_path)
 
 
@@ -117,7 +144,7 @@ class NmkModel:
     """
     pip command extra args
 
-    :deprecated: This field is deprecated and is only set when used with the legacy EnvBackend.
+    :deprecated: This field is deprecated and is only set when used with the legacy EnvBackend (once detected).
     """
 
     overridden_refs: dict[str, Path] = field(default_factory=dict[str, Path])
@@ -126,8 +153,41 @@ class NmkModel:
     path_finder: _NmkPathFinder = field(default_factory=_NmkPathFinder)
     """Path finder instance"""
 
-    env_backend: EnvBackend = EnvBackendFactory.detect(verbose_subprocess=False)
-    """Python environment backend, created when first project file is loaded"""
+    _env_backend: "EnvBackend | None" = field(default=None, repr=False)
+
+    config_dependents: dict[str, dict[int, NmkConfig]] = field(default_factory=dict[str, dict[int, NmkConfig]])
+    """Config references graph: for each config item name, the config item instances referencing it (indexed by id)"""
+
+    @property
+    def project_dir(self) -> Path | None:
+        """
+        Project directory, once first project file is loaded (None before)
+        """
+        project_dir = self.config.get(NmkRootConfig.PROJECT_DIR)
+        return project_dir.static_value if isinstance(project_dir, NmkStaticConfig) and project_dir.static_value else None
+
+    @property
+    def env_backend(self) -> "EnvBackend":
+        """Python environment backend for project directory (if not set, detected on first use, and then reused)"""
+
+        # Detect backend on first use, if not set
+        if self._env_backend is None:
+            from nmk._internal.envdetect import get_env_backend
+
+            env_backend = get_env_backend(self.project_dir)
+            if self.project_dir is None:
+                # Project not known yet: don't remember it
+                return env_backend
+            self._env_backend = env_backend
+
+            # Legacy backend: remember pip args
+            if hasattr(env_backend, "_pip_args"):
+                self.pip_args = cast(str, env_backend._pip_args)  # type: ignore
+        return self._env_backend
+
+    @env_backend.setter
+    def env_backend(self, env_backend: "EnvBackend | None"):
+        self._env_backend = env_backend
 
     def add_config(
         self,
@@ -138,6 +198,7 @@ class NmkModel:
         task_config: bool = False,
         resolver_params: NmkDictConfig | None = None,
         adapt_type: bool = False,
+        resolver_loader: Callable[[], object] | None = None,
     ) -> NmkConfig:
         """
         Add a config item to model
@@ -149,6 +210,7 @@ class NmkModel:
         :param task_config: use inner task config dict
         :param resolver_params: resolver parameters
         :param adapt_type: when overriding, adapt value type to overridden type (if possible, works for str->int and str->bool)
+        :param resolver_loader: resolver instance loader, invoked on first access (if resolver instance is not provided)
         :return: created config item instance
         """
 
@@ -156,16 +218,17 @@ class NmkModel:
         is_list = is_dict = False
         if init_value is not None:
             # Yes: with real value read from file
-            NmkLogger.debug(f"New static config {name} with value: {init_value}")
+            NmkLogger.debug(lambda: f"New static config {name} with value: {init_value}")
             cfg = NmkStaticConfig(name, self, path, init_value)
             is_list = isinstance(init_value, list)
             is_dict = isinstance(init_value, dict)
         else:
             # No: with resolver
-            assert resolver is not None, f"Internal error: resolver is not set for config {name}"
-            NmkLogger.debug(f"New dynamic config {name} with resolver class {type(resolver).__name__}")
-            cfg = NmkResolvedConfig(name, self, path, resolver, resolver_params)
-        new_type = cfg.value_type
+            assert resolver is not None or resolver_loader is not None, f"Internal error: resolver is not set for config {name}"
+            NmkLogger.debug(
+                lambda: f"New dynamic config {name} with resolver class {type(resolver).__name__ if resolver is not None else '(loaded on demand)'}"
+            )
+            cfg = NmkResolvedConfig(name, self, path, resolver, resolver_params, resolver_loader)
 
         # Config object to work with
         config_dict = self.tasks_config if task_config else self.config
@@ -173,21 +236,16 @@ class NmkModel:
         # Overriding?
         old_config = config_dict.get(name, None)
         if old_config is not None:
-            NmkLogger.debug(f"Overriding config {name}")
+            NmkLogger.debug(lambda: f"Overriding config {name}")
             old_config = config_dict[name]
 
             # Check for final
             assert not old_config.is_final, f"Can't override final config {name}"
 
-            # Check for type change
-            old_type = config_dict[name].value_type
-            if adapt_type and (old_type in _SUPPORTED_TYPES_ADAPTATION.get(new_type, [])) and init_value is not None:
-                init_value = _SUPPORTED_TYPES_ADAPTATION[new_type][old_type](init_value)
-                NmkLogger.debug(f"Adapting config {name} value from {new_type.__name__} to {old_type.__name__}: {init_value}")
-                cfg = NmkStaticConfig(name, self, path, init_value)
-            else:
-                # Types can't differ if no adaptation required
-                assert new_type == old_type, f"Unexpected type change for config {name} ({old_type.__name__} --> {new_type.__name__})"
+            # Check for type change (only when overriding); deferred to first value/type access if resolvers are involved (not loaded yet)
+            type_check = self._override_type_check(name, cfg, old_config, init_value if adapt_type else None)
+            if not isinstance(cfg, NmkResolvedConfig) and not isinstance(old_config, NmkResolvedConfig):
+                type_check()
 
         # Add config to model
         if is_list or is_dict:
@@ -201,7 +259,55 @@ class NmkModel:
             # Update value
             config_dict[name] = cfg
 
-        return config_dict[name]
+        # Update references graph
+        out = config_dict[name]
+        if old_config is not None and (isinstance(cfg, NmkResolvedConfig) or isinstance(old_config, NmkResolvedConfig)):
+            out._defer_override_check(type_check)
+        for ref_name in cfg.references:
+            self.config_dependents.setdefault(ref_name, {})[id(out)] = out
+
+        # Values depending on the overridden item are now outdated
+        if old_config is not None:
+            self.invalidate_config(out)
+
+        return out
+
+    def _override_type_check(self, name: str, cfg: NmkConfig, old_config: NmkConfig, adapted_value: Any) -> Callable[[], None]:
+        # Build type check for an overriding item (with value adaptation to the overridden type, if possible)
+        def check():
+            new_type = cfg.value_type
+            old_type = old_config.value_type
+            if isinstance(cfg, NmkStaticConfig) and adapted_value is not None and (old_type in _SUPPORTED_TYPES_ADAPTATION.get(new_type, [])):
+                cfg.static_value = _SUPPORTED_TYPES_ADAPTATION[new_type][old_type](adapted_value)
+                cfg._type = old_type
+                NmkLogger.debug(lambda: f"Adapting config {name} value from {new_type.__name__} to {old_type.__name__}: {cfg.static_value}")
+            else:
+                # Types can't differ if no adaptation required
+                assert new_type == old_type, f"Unexpected type change for config {name} ({old_type.__name__} --> {new_type.__name__})"
+
+        return check
+
+    def invalidate_config(self, cfg: NmkConfig):
+        """
+        Forget cached values of a config item, and of all the items depending on it (directly or not)
+
+        :param cfg: modified config item
+        """
+
+        # Walk through the references graph
+        cfg.invalidate()
+        to_visit = [cfg.name]
+        visited = {cfg.name}
+        count = 0
+        while len(to_visit):
+            for dependent in self.config_dependents.get(to_visit.pop(), {}).values():
+                dependent.invalidate()
+                count += 1
+                if dependent.name not in visited:
+                    visited.add(dependent.name)
+                    to_visit.append(dependent.name)
+        if count:
+            NmkLogger.debug(lambda: f"Invalidated {count} config item(s) depending on {cfg.name}")
 
     def load_class(self, qualified_class: str, expected_type: object) -> object:
         """
@@ -241,10 +347,10 @@ class NmkModel:
         :param task: task instance to be added
         """
 
-        NmkLogger.debug(f"{'Override' if task.name in self.tasks else 'New'} task {task.name}")
+        NmkLogger.debug(lambda: f"{'Override' if task.name in self.tasks else 'New'} task {task.name}")
 
-        # Shortcut to task model in builder
-        if task.builder is not None:
+        # Shortcut to task model in builder (if already loaded)
+        if task.builder_loader is None and task.builder is not None:
             task.builder.update_task(task)
 
         # Store in model
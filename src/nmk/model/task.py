@@ -2,6 +2,8 @@
 Nmk task module
 """
 
+import threading
+from collections.abc import Callable
 from dataclasses import dataclass, field
 from pathlib import Path
 
@@ -10,6 +12,9 @@ from rich.text import Text
 
 from nmk.model.config import NmkConfig, NmkDictConfig, NmkListConfig
 
+# Builders loading lock (builders may be loaded on demand from parallel build threads)
+_builder_lock = threading.RLock()
+
 
 @dataclass
 class NmkTask:
@@ -29,8 +34,7 @@ class NmkTask:
     emoji: Emoji | Text
     """Task emoji or rich text string"""
 
-    builder: object
-    """Task builder instance"""
+    _builder: object = field(repr=False, compare=False)
 
     params: NmkDictConfig
     """Task builder parameters"""
@@ -62,6 +66,34 @@ class NmkTask:
     skipped: bool = False
     """Task skip mode"""
 
+    builder_name: str | None = None
+    """Task builder qualified class name (as declared in project file)"""
+
+    builder_loader: Callable[[], object] | None = None
+    """Task builder loader, invoked on first access to builder instance"""
+
+    @property
+    def builder(self) -> object:
+        """Task builder instance (when loaded on demand, imported and instantiated on first access)"""
+
+        # Load builder on first access, if not set yet (only once, even if accessed concurrently)
+        if self._builder is None and self.builder_loader is not None:
+            with _builder_lock:
+                if self._builder is None:
+                    builder = self.builder_loader()
+                    builder.update_task(self)
+                    self._builder = builder
+        return self._builder
+
+    @builder.setter
+    def builder(self, builder: object):
+        self._builder = builder
+
+    @property
+    def has_builder(self) -> bool:
+        """Task builder presence (without loading it)"""
+        return self._builder is not None or self.builder_loader is not None
+
     def __resolve_task(self, name: str | list[str]) -> object:
         if name is not None:
             # Iterate on candidate names until we find a known one
@@ -1,8 +1,11 @@
+import asyncio
 import os
 import subprocess
 import sys
+import threading
+from collections import deque
 from pathlib import Path
-from typing import Any
+from typing import IO, Any
 
 from nmk.logs import NmkLogger, NmkLogWrapper
 
@@ -11,7 +14,43 @@ Miscellaneous utility functions
 """
 
 
-def run_with_logs(args: list[str], logger: NmkLogWrapper = NmkLogger, check: bool = True, cwd: Path | None = None) -> subprocess.CompletedProcess[str]:
+STREAM_TAIL_LINES = 200
+"""Default number of lines kept from each output stream, when running a subprocess in streaming mode"""
+
+
+def _log_stream(pipe: IO[str], logger: NmkLogWrapper, name: str, tail: deque[str]):
+    # Log lines as soon as they are read, and only keep the last ones
+    with pipe:
+        for line in pipe:
+            line = line.rstrip("\r\n")
+            logger.debug(lambda line=line: f">> {name}: {line}")
+            tail.append(line)
+
+
+def _run_streamed(args: list[str], logger: NmkLogWrapper, cwd: Path | None, tail_lines: int) -> subprocess.CompletedProcess[str]:
+    # Read both streams concurrently (to avoid blocking the subprocess when one of the pipes is full)
+    tails: tuple[deque[str], deque[str]] = (deque(maxlen=tail_lines), deque(maxlen=tail_lines))
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8", errors="ignore", cwd=cwd) as p:
+        readers = [
+            threading.Thread(target=_log_stream, args=(pipe, logger, name, tail), daemon=True)
+            for pipe, name, tail in [(p.stdout, "stdout", tails[0]), (p.stderr, "stderr", tails[1])]
+        ]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        rc = p.wait()
+    return subprocess.CompletedProcess(args, rc, "".join(f"{line}\n" for line in tails[0]), "".join(f"{line}\n" for line in tails[1]))
+
+
+def run_with_logs(
+    args: list[str],
+    logger: NmkLogWrapper = NmkLogger,
+    check: bool = True,
+    cwd: Path | None = None,
+    stream: bool = False,
+    tail_lines: int = STREAM_TAIL_LINES,
+) -> subprocess.CompletedProcess[str]:
     """
     Execute subprocess, and logs output/error streams + error code
 
@@ -19,21 +58,159 @@ def run_with_logs(args: list[str], logger: NmkLogWrapper = NmkLogger, check: boo
     :param logger: logger instance
     :param check: if True and subprocess return code is not 0, raise an exception
     :param cwd: current working directory for subprocess
-    :return: completed process instance
+    :param stream: if True, log output/error lines as soon as they are produced, and only keep the last ones in memory
+    :param tail_lines: in streaming mode, number of lines kept from each stream
+    :return: completed process instance (in streaming mode, stdout/stderr only hold the last lines of each stream)
     """
-    logger.debug(f"Running command: {args}")
-    cp = subprocess.run(args, check=False, capture_output=True, text=True, encoding="utf-8", errors="ignore", cwd=cwd)
-    logger.debug(f">> rc: {cp.returncode}")
-    logger.debug(">> stderr:")
-    list(map(logger.debug, cp.stderr.splitlines(keepends=False)))
-    logger.debug(">> stdout:")
-    list(map(logger.debug, cp.stdout.splitlines(keepends=False)))
-    assert not check or cp.returncode == 0, (
-        f"command returned {cp.returncode}" + (f"\n{cp.stdout}" if len(cp.stdout) else "") + (f"\n{cp.stderr}" if len(cp.stderr) else "")
-    )
+    logger.debug(lambda: f"Running command: {args}")
+    if stream:
+        cp = _run_streamed(args, logger, cwd, tail_lines)
+        logger.debug(lambda: f">> rc: {cp.returncode}")
+    else:
+        cp = subprocess.run(args, check=False, capture_output=True, text=True, encoding="utf-8", errors="ignore", cwd=cwd)
+        logger.debug(lambda: f">> rc: {cp.returncode}")
+        logger.debug(">> stderr:")
+        list(map(logger.debug, cp.stderr.splitlines(keepends=False)))
+        logger.debug(">> stdout:")
+        list(map(logger.debug, cp.stdout.splitlines(keepends=False)))
+    assert not check or cp.returncode == 0, _error_message(cp)
+    return cp
+
+
+def _error_message(cp: subprocess.CompletedProcess[str]) -> str:
+    # Error message for a failed command
+    return f"command returned {cp.returncode}" + (f"\n{cp.stdout}" if len(cp.stdout) else "") + (f"\n{cp.stderr}" if len(cp.stderr) else "")
+
+
+# Max line length read from async subprocess streams
+_ASYNC_LINE_LIMIT = 1024 * 1024
+
+
+async def _log_stream_async(reader: asyncio.StreamReader, logger: NmkLogWrapper, name: str, tail: deque[str]):
+    # Log lines as soon as they are read, and only keep the last ones
+    async for raw_line in reader:
+        line = raw_line.decode("utf-8", errors="ignore").rstrip("\r\n")
+        logger.debug(lambda line=line: f"{name}: {line}")
+        tail.append(line)
+
+
+async def run_with_logs_async(
+    args: list[str],
+    logger: NmkLogWrapper = NmkLogger,
+    check: bool = True,
+    cwd: Path | None = None,
+    tail_lines: int = STREAM_TAIL_LINES,
+    prefix: str = "",
+) -> subprocess.CompletedProcess[str]:
+    """
+    Execute subprocess asynchronously, and logs output/error streams lines (as soon as they are produced) + error code
+
+    :param args: subprocess commands and arguments
+    :param logger: logger instance
+    :param check: if True and subprocess return code is not 0, raise an exception
+    :param cwd: current working directory for subprocess
+    :param tail_lines: number of lines kept from each stream
+    :param prefix: prefix for all logged lines
+    :return: completed process instance (stdout/stderr only hold the last lines of each stream)
+    """
+    logger.debug(lambda: f"{prefix}Running command: {args}")
+    tails: tuple[deque[str], deque[str]] = (deque(maxlen=tail_lines), deque(maxlen=tail_lines))
+    p = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, cwd=cwd, limit=_ASYNC_LINE_LIMIT)
+    try:
+        await asyncio.gather(
+            _log_stream_async(p.stdout, logger, f"{prefix}>> stdout", tails[0]),  # type: ignore
+            _log_stream_async(p.stderr, logger, f"{prefix}>> stderr", tails[1]),  # type: ignore
+        )
+        rc = await p.wait()
+    except asyncio.CancelledError:
+        # Cancelled (another command failed): stop this one too
+        if p.returncode is None:  # pragma: no branch
+            p.kill()
+            await p.wait()
+        raise
+    cp = subprocess.CompletedProcess(args, rc, "".join(f"{line}\n" for line in tails[0]), "".join(f"{line}\n" for line in tails[1]))
+    logger.debug(lambda: f"{prefix}>> rc: {cp.returncode}")
+    assert not check or cp.returncode == 0, _error_message(cp)
     return cp
 
 
+async def _run_all_async(
+    commands: list[list[str]], logger: NmkLogWrapper, check: bool, cwd: Path | None, jobs: int, fail_fast: bool, tail_lines: int
+) -> list[subprocess.CompletedProcess[str]]:
+    # Run commands, with a concurrency limit
+    semaphore = asyncio.Semaphore(jobs)
+
+    async def run_one(index: int, args: list[str]) -> subprocess.CompletedProcess[str]:
+        async with semaphore:
+            return await run_with_logs_async(args, logger, check and fail_fast, cwd, tail_lines, f"[{index + 1}/{len(commands)}] ")
+
+    tasks = [asyncio.ensure_future(run_one(i, args)) for i, args in enumerate(commands)]
+    try:
+        results = list(await asyncio.gather(*tasks))
+    except BaseException:
+        # Fail fast: cancel all other commands
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    # Collected errors
+    failed = [(i, cp) for i, cp in enumerate(results) if cp.returncode != 0]
+    assert not check or not len(failed), f"{len(failed)}/{len(commands)} commands failed:" + "".join(
+        f"\n[{i + 1}/{len(commands)}] {cp.args}: {_error_message(cp)}" for i, cp in failed
+    )
+    return results
+
+
+def run_all_with_logs(
+    commands: list[list[str]],
+    logger: NmkLogWrapper = NmkLogger,
+    check: bool = True,
+    cwd: Path | None = None,
+    jobs: int | None = None,
+    fail_fast: bool = True,
+    tail_lines: int = STREAM_TAIL_LINES,
+) -> list[subprocess.CompletedProcess[str]]:
+    """
+    Execute several subprocesses concurrently, and logs their output/error streams lines (prefixed with command index) + error codes
+
+    :param commands: list of subprocess commands and arguments
+    :param logger: logger instance
+    :param check: if True and any subprocess return code is not 0, raise an exception
+    :param cwd: current working directory for subprocesses
+    :param jobs: max number of concurrently running subprocesses (default: CPU count)
+    :param fail_fast: if True, stop all other subprocesses as soon as one of them fails; otherwise, wait for all of them and report all errors
+    :param tail_lines: number of lines kept from each stream of each subprocess
+    :return: completed process instances, in commands order (stdout/stderr only hold the last lines of each stream)
+    """
+
+    def run_batch() -> list[subprocess.CompletedProcess[str]]:
+        return asyncio.run(_run_all_async(commands, logger, check, cwd, jobs or os.cpu_count() or 1, fail_fast, tail_lines))
+
+    # Already in a running event loop (e.g. called from async code)?
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # No: simply run the batch in a new loop
+        return run_batch()
+
+    # Yes: run the batch in a new loop, from a worker thread (and forward its result or error)
+    result: dict[str, Any] = {}
+
+    def worker():
+        try:
+            result["out"] = run_batch()
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=worker, name="nmk-run-all")
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["out"]
+
+
 def run_pip(args: list[str], logger: NmkLogWrapper = NmkLogger, extra_args: str = "") -> str:  # pragma: no cover
     """
     Execute pip command, with logging
@@ -1,5 +1,6 @@
 import logging
 import shutil
+import threading
 
 from nmk.model.builder import NmkTaskBuilder
 
@@ -50,3 +51,14 @@ class StandardLoggingBuilder(NmkTaskBuilder):
     def build(self):
         # Nothing to do but log some messages
         logging.debug("This is a standard debug message")
+
+
+# Shared barrier, to verify that tasks are really running in parallel
+_PARALLEL_BARRIER = threading.Barrier(2)
+
+
+class ParallelBuilder(NmkTaskBuilder):
+    def build(self):
+        # Wait for the other task (will fail if not running in parallel)
+        _PARALLEL_BARRIER.wait(timeout=10)
+        self.logger.warning(f"Parallel task {self.task.name} done")
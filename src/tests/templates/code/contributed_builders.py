@@ -0,0 +1,11 @@
+import time
+
+from nmk.model.builder import NmkTaskBuilder
+
+# Slow module import, to let parallel tasks load their builders concurrently
+time.sleep(0.5)
+
+
+class SlowBuilder(NmkTaskBuilder):
+    def build(self, label: str):
+        self.logger.info(self.task.emoji, label)
@@ -1,5 +1,8 @@
+import logging
+import logging.handlers
 from pathlib import Path
 
+from nmk.logs import NmkLogger
 from tests.utils import NmkTester
 
 
@@ -17,9 +20,22 @@ class TestBasics(NmkTester):
         self.nmk("simplest.yml", extra_args=["--log-file", expected_log.as_posix()], with_logs=True)
         assert expected_log.is_file()
 
+    def test_simplest_project_with_logs_queue(self):
+        expected_log = self.test_folder / "queued.log"
+        self.nmk("build_default.yml", extra_args=["--log-file", expected_log.as_posix(), "--log-queue"], with_logs=True)
+
+        # All logs are written to file, and queue handler is removed from root logger
+        content = expected_log.read_text()
+        assert "foo:bar bar:123 ref:azerty" in content and "Done" in content
+        assert content.count("----- nmk version") == 1
+        assert not any(isinstance(h, logging.handlers.QueueHandler) for h in logging.root.handlers)
+
     def test_simplest_project_without_logs(self):
         self.nmk("simplest.yml", extra_args=["--log-file", ""], with_logs=True)
-        assert not self.nmk_cache.exists()
+        assert not (self.nmk_cache / "nmk.log").exists()
+
+        # Debug messages are skipped as early as possible
+        assert not NmkLogger.isEnabledFor(logging.DEBUG)
 
     def test_invalid_yml(self):
         self.nmk("invalid.yml", expected_error="While loading {project}: Project is malformed: ")
@@ -29,3 +45,26 @@ class TestBasics(NmkTester):
 
     def test_root_not_found(self):
         self.nmk("empty.yml", extra_args=["--root", "/missing/folder"], expected_rc=1)
+
+    def test_models_cache(self):
+        # First load: models are parsed, and cache is persisted
+        project = self.prepare_project("simplest.yml")
+        self.nmk(project)
+        self.check_logs(f"Loading model from {project}")
+        assert (self.nmk_cache / "models.pickle").is_file()
+
+        # Second load: models are reused from cache
+        self.nmk(project)
+        self.check_logs(f"Reusing cached model for {project}")
+
+        # Updated file: model is parsed again
+        project.write_text(project.read_text() + "\n")
+        self.nmk(project)
+        self.check_logs(["Reusing cached model for", f"Loading model from {project}"], check_order=True)
+
+    def test_models_cache_invalid(self):
+        # Corrupted cache is ignored
+        (self.nmk_cache / "models.pickle").parent.mkdir(parents=True)
+        (self.nmk_cache / "models.pickle").write_text("garbage")
+        self.nmk("simplest.yml")
+        self.check_logs("Ignoring invalid models cache")
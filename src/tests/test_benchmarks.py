@@ -0,0 +1,302 @@
+import logging
+import re
+import subprocess
+import sys
+import time
+from typing import Any
+
+import pytest
+
+from nmk._internal.build import NmkBuild
+from nmk._internal.files import load_schema, load_validator
+from nmk._internal.parser import NmkParser
+from nmk._internal.yamlloader import load_yaml
+from nmk.logs import NmkLogger, NmkLogWrapper, _render_emoji
+from nmk.model.config import CONFIG_REF_PATTERN
+from nmk.model.model import NmkModel, _NmkPathFinder
+from nmk.model.task import NmkTask
+from tests.utils import NmkTester
+
+# Modules that must not be imported on CLI startup (only when loading a project, or building)
+STARTUP_FORBIDDEN_MODULES = [
+    "buildenv",
+    "coloredlogs",
+    "jsonschema",
+    "nmk._internal.build",
+    "nmk._internal.loader",
+    "requests",
+    "rich",
+    "yaml",
+]
+
+# Budgets for all modules import on CLI startup (time one is generous, to stay stable on busy CI runners)
+STARTUP_IMPORT_BUDGET_COUNT = 250
+STARTUP_IMPORT_BUDGET_MS = 2000
+
+# Pattern for "-X importtime" output lines
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \|( *)(\S+)$")
+
+
+class TestBenchmarks(NmkTester):
+    def log_duration(self, label: str, start: float) -> float:
+        # Log benchmark step duration
+        duration = time.perf_counter() - start
+        logging.info(f"Benchmark: {label}: {duration * 1000:.1f}ms")
+        return duration
+
+    def test_build_order_10k_tasks(self):
+        # Synthetic 10k tasks graph: long dependencies chain + lots of shared sub-graphs
+        count = 10000
+        model = NmkModel(NmkParser().parse([f"task{count - 1}"]))
+        for name, deps in [("prologue", []), ("epilogue", [])] + [(f"task{i}", [f"task{i - 1}", f"task{i // 2}"] if i else []) for i in range(count)]:
+            model.tasks[name] = NmkTask(name, "", False, None, None, None, deps, None, None, None, None, None, None, model)
+        for task in model.tasks.values():
+            task._resolve_subtasks()
+
+        # Prepare build order
+        start = time.perf_counter()
+        build = NmkBuild(model)
+        self.log_duration(f"build order for {count} tasks", start)
+
+        # All tasks are ordered after their dependencies
+        positions = {t.name: i for i, t in enumerate(build.ordered_tasks)}
+        assert len(positions) == count + 2
+        assert all(positions[d.name] < positions[t.name] for t in build.ordered_tasks for d in t.subtasks)
+        assert [len(p) for p in build.phases] == [1, count, 1]
+
+    def test_config_invalidation_5k_items(self):
+        # Synthetic 5k config items tree, each item referencing its parent item and a shared leaf item
+        count = 5000
+        model = NmkModel(NmkParser().parse([]))
+        for j in range(10):
+            model.add_config(f"leaf{j}", None, f"l{j}")
+        model.add_config("item0", None, "root")
+        for i in range(1, count):
+            model.add_config(f"item{i}", None, f"${{item{(i - 1) // 2}}}/${{leaf{i % 10}}}")
+
+        # Resolve all items
+        start = time.perf_counter()
+        values = {i: model.config[f"item{i}"].value for i in range(count)}
+        self.log_duration(f"config resolution for {count} items", start)
+        assert values[4] == "root/l1/l4"
+
+        # Override one item: only its sub-tree is invalidated
+        model.add_config("item2", None, "changed")
+        invalidated = [i for i in range(count) if model.config[f"item{i}"].cached_value is None]
+        assert 0 < len(invalidated) < count // 2
+        assert all(model.config[f"item{i}"].cached_value is values[i] for i in range(count) if i not in invalidated)
+
+        # Resolve again
+        start = time.perf_counter()
+        new_values = {i: model.config[f"item{i}"].value for i in range(count)}
+        self.log_duration(f"config resolution after override ({len(invalidated)} invalidated items)", start)
+        assert new_values[6] == "changed/l6"
+        assert new_values[4] is values[4]
+
+    def legacy_format(self, model: NmkModel, to_format: str) -> Any:
+        # Legacy substitution loop (search + rebuild string for each reference)
+        m = True
+        while m is not None:
+            m = CONFIG_REF_PATTERN.search(to_format)
+            if m is not None:
+                ref_value = model.config[m.group(3)].value
+                begin, end = m.span(2)
+                if m.group(0) == to_format and not isinstance(ref_value, str):
+                    return ref_value
+                to_format = to_format[0:begin] + str(ref_value) + to_format[end:]
+        return to_format
+
+    def test_config_template_vs_legacy(self):
+        # String with lots of references
+        refs = 300
+        rounds = 100
+        model = NmkModel(NmkParser().parse([]))
+        for i in range(refs):
+            model.add_config(f"ref{i}", None, f"value{i}")
+        template = " ".join(f"${{ref{i}}}" for i in range(refs))
+        cfg = model.add_config("big", None, template)
+
+        # Compare both paths
+        start = time.perf_counter()
+        for _ in range(rounds):
+            legacy_value = self.legacy_format(model, template)
+        legacy_duration = self.log_duration(f"legacy substitution of {refs} references ({rounds} rounds)", start)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            value = cfg.resolve(cache=False)
+        compiled_duration = self.log_duration(f"compiled template substitution of {refs} references ({rounds} rounds)", start)
+        assert value == legacy_value
+        logging.info(f"Benchmark: compiled templates speedup: x{legacy_duration / compiled_duration:.1f}")
+
+    def startup_imports(self) -> dict[str, int]:
+        # Cold CLI startup, with imports timing
+        cp = subprocess.run([sys.executable, "-X", "importtime", "-m", "nmk", "--version"], capture_output=True, text=True, check=True)
+        assert cp.stdout.startswith("nmk version ")
+        return {m.group(3): int(m.group(1)) for m in filter(None, map(IMPORT_TIME_PATTERN.match, cp.stderr.splitlines()))}
+
+    def test_version_startup_imports(self):
+        imports = self.startup_imports()
+
+        # Heavy modules are not loaded
+        loaded = sorted(m for m in imports if any(m == f or m.startswith(f + ".") for f in STARTUP_FORBIDDEN_MODULES))
+        assert loaded == []
+
+        # Imported modules count is within budget
+        assert len(imports) < STARTUP_IMPORT_BUDGET_COUNT
+
+        # Total imports time is within budget (best of a few runs, as other tests may load the machine)
+        total_ms = sum(imports.values()) / 1000
+        for _ in range(2):
+            if total_ms < STARTUP_IMPORT_BUDGET_MS:
+                break
+            total_ms = min(total_ms, sum(self.startup_imports().values()) / 1000)
+        logging.info(f"Benchmark: {len(imports)} modules imported on startup: {total_ms:.1f}ms")
+        assert total_ms < STARTUP_IMPORT_BUDGET_MS
+
+    def test_path_finder_large_tree(self):
+        # Synthetic contributed python path: a few modules, lots of vendored files
+        root = self.test_folder / "plugin"
+        for i in range(50):
+            vendored = root / "vendored" / f"pkg{i}"
+            vendored.mkdir(parents=True)
+            for j in range(40):
+                (vendored / f"mod{j}.py").touch()
+        (root / "builders").mkdir()
+        (root / "builders" / "__init__.py").touch()
+        (root / "builders" / "my_builder.py").write_text("VALUE = 123\n")
+
+        # Contribute path (modules are looked for on demand only)
+        finder = _NmkPathFinder()
+        start = time.perf_counter()
+        finder.contribute_path([root])
+        self.log_duration("contribute python path with 2000 files", start)
+        try:
+            # Module and package lookups
+            assert finder.custom_import("builders.my_builder").VALUE == 123
+            assert finder.find_spec("builders.my_builder", None).origin == str(root / "builders" / "my_builder.py")
+            assert finder.find_spec("builders", None).origin == str(root / "builders" / "__init__.py")
+
+            # Unknown modules are remembered
+            assert finder.find_spec("builders.unknown", None) is None
+            assert "builders.unknown" in finder._lookups and finder._lookups["builders.unknown"] is None
+        finally:
+            sys.meta_path.remove(finder)
+            for name in ["builders", "builders.my_builder"]:
+                sys.modules.pop(name, None)
+
+    def synthetic_project_models(self, count: int) -> list[dict[str, Any]]:
+        # Synthetic project files content, with config items and tasks
+        return [
+            {
+                "refs": [f"project{j}.yml" for j in range(i)][-3:],
+                "config": {f"item{i}_{j}": f"value{j}" if j % 2 else {"foo": [j, str(j)], "bar": {"ref": f"${{item{i}_{j - 1}}}"}} for j in range(6)},
+                "tasks": {
+                    f"task{i}_{j}": {
+                        "description": f"Task {j}",
+                        "emoji": "hammer",
+                        "deps": [f"task{i}_{k}" for k in range(j)][-2:],
+                        "builder": "tests.sample_tasks.ParamBuilder",
+                        "params": {"foo": "bar"},
+                        "input": [f"${{item{i}_{j}}}"],
+                        "output": f"out{j}.txt",
+                    }
+                    for j in range(4)
+                },
+            }
+            for i in range(count)
+        ]
+
+    def test_schema_validator_vs_legacy(self):
+        import jsonschema
+
+        count = 100
+        models = self.synthetic_project_models(count)
+
+        # Legacy validation (schema checked + validator created for each file)
+        start = time.perf_counter()
+        for model in models:
+            jsonschema.validate(model, load_schema())
+        legacy_duration = self.log_duration(f"legacy validation of {count} project files", start)
+
+        # Cached validator
+        load_validator.cache_clear()
+        start = time.perf_counter()
+        for model in models:
+            assert jsonschema.exceptions.best_match(load_validator().iter_errors(model)) is None
+        cached_duration = self.log_duration(f"cached validator validation of {count} project files", start)
+        logging.info(f"Benchmark: cached validator speedup: x{legacy_duration / cached_duration:.1f}")
+
+        # Same errors are reported
+        invalid = {"config": {"foo": 1}, "tasks": {"bar": {"deps": "notAList"}}}
+        with pytest.raises(jsonschema.ValidationError) as e:
+            jsonschema.validate(invalid, load_schema())
+        assert str(jsonschema.exceptions.best_match(load_validator().iter_errors(invalid))) == str(e.value)
+
+    def test_yaml_backends(self):
+        import yaml
+
+        # Large generated project file
+        large_file = self.test_folder / "large.yml"
+        models = self.synthetic_project_models(50)
+        large_file.write_text(
+            yaml.dump({"config": {k: v for m in models for k, v in m["config"].items()}, "tasks": {k: v for m in models for k, v in m["tasks"].items()}})
+        )
+
+        # Compare both backends
+        start = time.perf_counter()
+        pure_model = load_yaml(large_file, fast=False)
+        pure_duration = self.log_duration(f"pure python YAML loading ({large_file.stat().st_size // 1024}KB)", start)
+        start = time.perf_counter()
+        fast_model = load_yaml(large_file)
+        fast_duration = self.log_duration(f"fast YAML loading ({large_file.stat().st_size // 1024}KB)", start)
+        assert fast_model == pure_model
+        logging.info(f"Benchmark: fast YAML loading speedup: x{pure_duration / fast_duration:.1f}")
+
+        # Duplicate keys and anchors are handled the same way
+        special_file = self.test_folder / "special.yml"
+        special_file.write_text("config:\n  foo: 1\n  foo: 2\n  base: &base\n    a: 1\n  derived:\n    <<: *base\n    b: 2\n  alias: *base\n")
+        assert (
+            load_yaml(special_file)
+            == load_yaml(special_file, fast=False)
+            == {"config": {"foo": 2, "base": {"a": 1}, "derived": {"a": 1, "b": 2}, "alias": {"a": 1}}}
+        )
+
+        # Same error messages
+        errors = []
+        for fast in [True, False]:
+            with pytest.raises(yaml.YAMLError) as e:
+                load_yaml(self.template("invalid.yml"), fast=fast)
+            errors.append(str(e.value))
+        assert errors[0] == errors[1]
+
+    def test_disabled_logs(self):
+        # Messages callables are only invoked for enabled levels
+        logger = logging.getLogger("nmk.tests.disabled")
+        logger.setLevel(logging.INFO)
+        wrapper = NmkLogWrapper(logger)
+        calls = []
+        wrapper.debug(lambda: calls.append("debug") or "debug message")
+        wrapper.info("hammer", lambda: calls.append("info") or "info message")
+        assert calls == ["info"]
+        assert not wrapper.isEnabledFor(logging.DEBUG) and wrapper.isEnabledFor(logging.INFO)
+        self.check_logs("info message")
+
+        # Emojis are rendered once
+        hits = _render_emoji.cache_info().hits
+        wrapper.info("hammer", "again")
+        assert _render_emoji.cache_info().hits == hits + 1
+
+        # Config items with big values, with debug logs enabled or not
+        count = 300
+        big_value = [list(range(10)) for _ in range(50)]
+        nmk_level = NmkLogger._logger.level
+        try:
+            for level in [logging.DEBUG, logging.INFO]:
+                NmkLogger._logger.setLevel(level)
+                model = NmkModel(NmkParser().parse([]))
+                start = time.perf_counter()
+                for i in range(count):
+                    model.add_config(f"item{i}", None, big_value)
+                self.log_duration(f"{count} config items with big values (debug logs {'enabled' if level == logging.DEBUG else 'disabled'})", start)
+        finally:
+            NmkLogger._logger.setLevel(nmk_level)
@@ -1,5 +1,7 @@
+import json
 import os
 
+from nmk._internal.stats import NmkStatCache
 from tests.utils import NmkTester
 
 
@@ -82,7 +84,7 @@ class TestBuild(NmkTester):
 
         # Build 2: output > input --> skip
         self.nmk(project_file, extra_args=["--config", f"test_folder={self.test_folder}"])
-        self.check_logs("Task skipped, nothing to do")
+        self.check_logs(["Task skipped, nothing to do", "Stat cache: 1 hits, 3 misses"])
 
         # Build 3: project file updated --> build
         project_file.touch()
@@ -94,6 +96,76 @@ class TestBuild(NmkTester):
         self.nmk(project_file, extra_args=["--config", f"test_folder={self.test_folder}", "--force"])
         self.check_logs("Force build, don't check inputs vs outputs")
 
+    def test_parallel_build(self):
+        # Both sub-tasks need to run concurrently to meet each other, then parent is built
+        self.nmk("build_parallel.yml", extra_args=["--jobs", "2"], with_prologue=True, with_epilogue=True)
+        self.check_logs(["Starting the build! (with 2 parallel jobs)", "Parallel task parallelA done", "Parent task done", "3 built tasks"], check_order=True)
+        self.check_logs(["Parallel task parallelB done", "Parent task done"], check_order=True)
+
+    def test_parallel_build_contributed_builders(self):
+        # Tasks with builders from the same contributed module, loaded concurrently
+        self.nmk("build_parallel_contributed.yml", extra_args=["--jobs", "2"])
+        self.check_logs(["Contributed task slowA done", "Contributed task slowB done"])
+
+    def test_parallel_build_error(self):
+        # Failing task stops the build: dependent task is never built
+        self.nmk(
+            "build_parallel.yml",
+            extra_args=["--jobs", "2", "parallelErrorParent"],
+            expected_error="An error occurred during task parallelError build: Some error happened!",
+        )
+        self.check_logs("Task parallelError failed, waiting for running tasks to complete")
+        assert "WARNING ❗ - Should not be built" not in self.test_logs.read_text(encoding="utf-8")
+
+    def test_digests_rebuild(self):
+        test_input = self.test_folder / "someInput.txt"
+        test_output = self.test_folder / "someOutput.txt"
+        project_file = self.prepare_project("build_copy.yml")
+        args = ["--config", f"test_folder={self.test_folder}", "--digests"]
+
+        # Build 1: no output yet --> build
+        test_input.write_text("foo")
+        self.nmk(project_file, extra_args=args)
+        self.check_logs([f"(Re)Build task: missing output ({test_output})", f"Copying {test_input} to {test_output}"])
+        assert (self.nmk_cache / "digests.json").is_file()
+
+        # Build 2: same digests --> skip
+        self.nmk(project_file, extra_args=args)
+        self.check_logs("Output is already up to date (same digests): skip task")
+
+        # Build 3: input touched, but content is the same --> skip
+        test_input.touch()
+        project_file.touch()
+        self.nmk(project_file, extra_args=args)
+        assert self.test_logs.read_text(encoding="utf-8").count("Output is already up to date (same digests): skip task") == 2
+
+        # Build 4: input content modified --> build
+        test_input.write_text("bar")
+        self.nmk(project_file, extra_args=args)
+        self.check_logs("(Re)Build task: inputs, params or builder digests changed since last build")
+        assert test_output.read_text() == "bar"
+
+    def test_digests_invalid_db(self):
+        # Corrupted database is ignored
+        self.nmk_cache.mkdir()
+        (self.nmk_cache / "digests.json").write_text("garbage")
+        (self.test_folder / "someInput.txt").write_text("foo")
+        self.nmk("build_copy.yml", extra_args=["--config", f"test_folder={self.test_folder}", "--digests"])
+        self.check_logs(["Ignoring invalid digests database", "Saving digests database"])
+
+    def test_stat_cache_invalidation(self):
+        # Outputs stats are forgotten once the task is built
+        test_input = self.test_folder / "someInput.txt"
+        test_input.touch()
+        stats = NmkStatCache()
+        assert stats.is_file(test_input)
+        assert not stats.exists(self.test_folder / "someOutput.txt")
+        (self.test_folder / "someOutput.txt").touch()
+        assert not stats.exists(self.test_folder / "someOutput.txt")
+        stats.invalidate([self.test_folder / "someOutput.txt"])
+        assert stats.exists(self.test_folder / "someOutput.txt")
+        assert (stats.hits, stats.misses) == (1, 3)
+
     def test_failling_build(self):
         self.nmk("build_error.yml", expected_error="An error occurred during task sampleBuild build: Some error happened!")
 
@@ -179,3 +251,26 @@ class TestBuild(NmkTester):
         # Check standard log only (no prefix)
         log_lines = expected_log.read_text(encoding="utf-8", errors="ignore").splitlines(keepends=False)
         assert any("root This is a standard debug message" in line for line in log_lines)
+
+    def test_profile(self):
+        self.nmk("build_default.yml", extra_args=["subA", "--profile"])
+        self.check_logs(
+            [
+                "Profiling summary:",
+                "Category   Name",
+                "phase      load",
+                "phase      build",
+                "check      (all)",
+                "task       subA",
+                "config items resolutions: ",
+            ]
+        )
+        trace_file = self.nmk_cache / "profile.json"
+        self.check_logs(f"Profiling trace written to {trace_file}")
+
+        # Trace file can be loaded by Chrome trace viewers
+        trace = json.loads(trace_file.read_text())
+        events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        assert {("load", "phase"), ("build", "phase"), ("subA", "check"), ("subA", "task")} <= {(e["name"], e["cat"]) for e in events}
+        assert all(e["dur"] >= 0 and "cpu_ms" in e["args"] for e in events)
+        assert trace["otherData"]["counters"]["config items resolutions"] > 0
@@ -98,26 +98,59 @@ class TestConfig(NmkTester):
         self.check_logs(["Adapting config someBool value from str to bool", 'Config dump: { "someBool": true }'])
 
     def test_config_invalid_resolver(self):
-        self.nmk("config_invalid_resolver.yml", expected_error="While loading {project}: Invalid class qualified name: AbcDef (missing separator: .)")
+        self.nmk(
+            "config_invalid_resolver.yml",
+            extra_args=["--validate"],
+            expected_error="While loading {project}: Invalid class qualified name: AbcDef (missing separator: .)",
+        )
 
     def test_config_unknown_module_resolver(self):
-        self.nmk("config_unknown_resolver.yml", expected_error="While loading {project}: Can't instantiate class foo.bar.SomeResolver:")
+        self.nmk(
+            "config_unknown_resolver.yml", extra_args=["--validate"], expected_error="While loading {project}: Can't instantiate class foo.bar.SomeResolver:"
+        )
 
     def test_config_unknown_class_resolver(self):
         self.nmk(
             "config_unknown_class_resolver.yml",
+            extra_args=["--validate"],
+            expected_error="While loading {project}: Can't instantiate class tests.failling_resolvers.UnknownResolver: Can't find class UnknownResolver in module tests.failling_resolvers",
+        )
+
+    def test_config_lazy_resolver(self):
+        # Resolver class is not loaded as long as config item is not used
+        self.nmk("config_unknown_class_resolver.yml")
+
+        # Loading error is reported once config item is resolved
+        self.nmk(
+            "config_unknown_class_resolver.yml",
+            extra_args=["--print", "someResolved"],
             expected_error="While loading {project}: Can't instantiate class tests.failling_resolvers.UnknownResolver: Can't find class UnknownResolver in module tests.failling_resolvers",
         )
 
+    def test_config_lazy_resolver_override(self):
+        # Overriding a resolved item doesn't load its resolver class, as long as the item is not used
+        self.nmk("config_unknown_class_resolver.yml", extra_args=["--config", "someResolved=foo"])
+
+        # Deferred type checks: adaptation, and type change
+        self.nmk("config_resolvers.yml", extra_args=["--config", "someBool=false", "--print", "someBool"])
+        self.check_logs(["Adapting config someBool value from str to bool: False", '"someBool": false'])
+        self.nmk(
+            "config_resolvers.yml",
+            extra_args=["--config", '{"someResolved": 12}', "--print", "someResolved"],
+            expected_error="Unexpected type change for config someResolved (str --> int)",
+        )
+
     def test_config_exception_resolver(self):
         self.nmk(
             "config_exception_resolver.yml",
+            extra_args=["--validate"],
             expected_error="While loading {project}: Can't instantiate class tests.failling_resolvers.FaillingResolver: Can't instantiate abstract class FaillingResolver",
         )
 
     def test_config_bad_type_resolver(self):
         self.nmk(
             "config_bad_type_resolver.yml",
+            extra_args=["--validate"],
             expected_error="While loading {project}: Unexpected type for loaded class tests.failling_resolvers.BadTypeResolver: got BadTypeResolver, expecting NmkConfigResolver subclass",
         )
 
@@ -143,7 +176,7 @@ class TestConfig(NmkTester):
     def test_config_throwing_resolver(self):
         self.nmk(
             "config_throwing_resolver.yml",
-            extra_args=["--print", "someResolved"],
+            extra_args=["--validate", "--print", "someResolved"],
             expected_error="While loading {project}: Error occurred while getting type for config someResolved: Always failed!",
         )
 
@@ -0,0 +1,108 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from _pytest.capture import CaptureFixture
+from _pytest.monkeypatch import MonkeyPatch
+
+from nmk.__main__ import nmk
+from nmk._internal.daemon import daemon_socket_path
+from tests.utils import NmkTester
+
+
+class TestDaemon(NmkTester):
+    def test_daemon_build(self, capsys: CaptureFixture[str]):
+        project = self.prepare_project("daemon.yml")
+        daemon_log = self.nmk_cache / "daemon.log"
+        try:
+            # First build: daemon is started, and output is streamed back (quiet mode: config is printed on stdout)
+            capsys.readouterr()
+            self.nmk(project, with_logs=True, extra_args=["--daemon", "-q", "--print", "greeting"])
+            assert json.loads(capsys.readouterr().out) == {"greeting": "hello"}
+            assert daemon_socket_path(self.test_folder.resolve()).exists()
+            assert "Handling request #1" in daemon_log.read_text()
+
+            # Second build: handled by the same daemon, with cached model
+            self.nmk(project, with_logs=True, extra_args=["--daemon", "-q", "--print", "greeting"])
+            assert json.loads(capsys.readouterr().out) == {"greeting": "hello"}
+            assert "Handling request #2" in daemon_log.read_text()
+            assert f"Reusing cached model for {project}" in (self.nmk_cache / "nmk.log").read_text()
+
+            # Updated project file is reloaded
+            project.write_text(project.read_text().replace("hello", "bye"))
+            self.nmk(project, with_logs=True, extra_args=["--daemon", "-q", "--print", "greeting"])
+            assert json.loads(capsys.readouterr().out) == {"greeting": "bye"}
+            assert "Handling request #3" in daemon_log.read_text()
+
+            # Errors are reported through the daemon as well
+            self.nmk(project, with_logs=True, extra_args=["--daemon", "--print", "unknown"], expected_rc=1)
+            assert "Unknown config item" in capsys.readouterr().err
+        finally:
+            # Stop daemon
+            assert nmk(["--root", self.test_folder.as_posix(), "--stop-daemon"]) == 0
+        assert "Stop requested" in daemon_log.read_text()
+
+    def test_daemon_remote_refs(self, capsys: CaptureFixture[str]):
+        # Local HTTP server, with ETag support
+        statuses = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.headers.get("If-None-Match") == '"v1"':
+                    statuses.append(304)
+                    self.send_response(304)
+                    self.end_headers()
+                else:
+                    statuses.append(200)
+                    body = b"config:\n    greeting: hello\n"
+                    self.send_response(200)
+                    self.send_header("ETag", '"v1"')
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        project = self.test_folder / "remote.yml"
+        project.write_text(f"refs:\n    - http://127.0.0.1:{server.server_address[1]}/remote.yml\n")
+
+        def run_nmk(extra_args: list[str]):
+            self.nmk(project, with_logs=True, extra_args=["--daemon", "-q", "--print", "greeting"] + extra_args)
+            assert json.loads(capsys.readouterr().out) == {"greeting": "hello"}
+
+        try:
+            # First build: download; second build: reuse cache
+            capsys.readouterr()
+            run_nmk([])
+            run_nmk([])
+            assert statuses == [200]
+
+            # Remote state is not kept by the daemon between builds: refresh and cache clear requests are honored
+            run_nmk(["--refresh-refs"])
+            assert statuses == [200, 304]
+            assert "Handling request #3" in (self.nmk_cache / "daemon.log").read_text()
+            run_nmk(["--no-cache"])
+            assert statuses == [200, 304, 200]
+        finally:
+            assert nmk(["--root", self.test_folder.as_posix(), "--stop-daemon"]) == 0
+            server.shutdown()
+            server.server_close()
+
+    def test_daemon_insecure_folder(self, monkeypatch: MonkeyPatch):
+        # Socket folder is accessible to other users: build in current process
+        socket_folder = self.test_folder / "sockets"
+        socket_folder.mkdir(mode=0o755)
+        socket_folder.chmod(0o755)
+        monkeypatch.setattr("nmk._internal.daemon.daemon_socket_path", lambda root: socket_folder / "nmk.sock")  # pyright: ignore[reportUnknownArgumentType]
+        self.nmk("simplest.yml", extra_args=["--daemon"])
+        self.check_logs(["Insecure nmk daemon socket folder", "nmk daemon is not available, building in current process"])
+        assert not (socket_folder / "nmk.sock").exists()
+
+    def test_daemon_unavailable(self, monkeypatch: MonkeyPatch):
+        # Can't start daemon: build in current process
+        monkeypatch.setattr("nmk._internal.daemon._spawn", lambda root: None)  # pyright: ignore[reportUnknownArgumentType]
+        self.nmk("simplest.yml", extra_args=["--daemon"])
+        self.check_logs("nmk daemon is not available, building in current process")
+
+        # Nothing to stop
+        assert nmk(["--root", self.test_folder.as_posix(), "--stop-daemon"]) == 0
@@ -1,8 +1,18 @@
+import io
 import re
 import subprocess
+import tarfile
+import threading
+from argparse import Namespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from zipfile import ZipFile
 
+import pytest
 from _pytest.monkeypatch import MonkeyPatch
 
+import nmk._internal.cache
+from nmk.model.model import NmkModel
 from nmk.utils import is_windows
 from tests.utils import NmkTester
 
@@ -108,6 +118,153 @@ class TestRefs(NmkTester):
         cache_folders = list(filter(lambda d: d.is_dir() and not d.name.startswith("."), (self.nmk_cache / "cache").glob("*")))
         assert len(cache_folders) == 1
 
+    def test_prefetch_http_refs(self, monkeypatch: MonkeyPatch):
+        # Fake downloads, only succeeding if both refs are downloaded concurrently
+        barrier = threading.Barrier(2)
+
+        def fake_download(root: Path, url: str, refresh: bool) -> Path:
+            barrier.wait(timeout=10)
+            return self.template("simplest.yml" if url.endswith("first.yml") else "config_sample.yml")
+
+        monkeypatch.setattr(nmk._internal.cache, "_download_file", fake_download)
+        self.nmk("ref_http_prefetch.yml")
+
+        # Refs are still loaded in declaration order
+        logs = self.test_logs.read_text(encoding="utf-8")
+        first = logs.index("Cached remote path: http://localhost/prefetch/first.yml")
+        second = logs.index("Cached remote path: http://localhost/prefetch/second.yml")
+        assert first < second
+
+    def test_refresh_http_refs(self, monkeypatch: MonkeyPatch):
+        # Local HTTP server, with ETag support
+        content = {"etag": '"v1"', "body": b"refs: []\n"}
+        statuses = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.headers.get("If-None-Match") == content["etag"]:
+                    statuses.append(304)
+                    self.send_response(304)
+                    self.end_headers()
+                else:
+                    statuses.append(200)
+                    self.send_response(200)
+                    self.send_header("ETag", content["etag"])
+                    self.send_header("Content-Length", str(len(content["body"])))
+                    self.end_headers()
+                    self.wfile.write(content["body"])
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/remote.yml"
+
+        def run_nmk(extra_args: list[str]):
+            # Forget in-process downloads state between runs
+            monkeypatch.setattr(nmk._internal.cache, "_downloads", {})
+            self.nmk(url, extra_args=extra_args)
+
+        try:
+            # First run: download; second run: reuse cache; third run: revalidate (not modified)
+            run_nmk([])
+            run_nmk([])
+            run_nmk(["--refresh-refs"])
+            assert statuses == [200, 304]
+            self.check_logs(f"Cached {url} is up to date")
+
+            # Remote changed: download again
+            content.update({"etag": '"v2"', "body": b"refs: []\nconfig:\n    someInt: 12\n"})
+            run_nmk(["--refresh-refs", "--print", "someInt"])
+            assert statuses == [200, 304, 200]
+            self.check_logs([f"Cached {url} changed, download it again", '"someInt": 12'])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_refresh_http_refs_error(self, monkeypatch: MonkeyPatch):
+        # Local HTTP server, failing after first download
+        statuses = [200, 500]
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = statuses.pop(0)
+                body = b"refs: []\nconfig:\n    someInt: 12\n" if status == 200 else b"Internal error"
+                self.send_response(status)
+                self.send_header("ETag", '"v1"')
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/remote.yml"
+
+        def run_nmk(extra_args: list[str]):
+            # Forget in-process downloads state between runs
+            monkeypatch.setattr(nmk._internal.cache, "_downloads", {})
+            self.nmk(url, extra_args=extra_args + ["--print", "someInt"])
+
+        try:
+            # First run: download; second run: revalidation fails, cached entry is kept
+            run_nmk([])
+            run_nmk(["--refresh-refs"])
+            assert statuses == []
+            self.check_logs([f"Can't revalidate cached {url} (HTTP error 500), keep using it", '"someInt": 12'])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # Remote can't be reached anymore: cached entry is kept as well
+        run_nmk(["--refresh-refs"])
+        self.check_logs([f"Can't revalidate cached {url} (", '"someInt": 12'])
+        assert "Max retries exceeded" in self.test_logs.read_text(encoding="utf-8")
+
+    def test_stream_http_archives(self):
+        # Build archives in memory
+        project = b"config:\n    someInt: 12\n"
+        tar_buffer = io.BytesIO()
+        with tarfile.open(fileobj=tar_buffer, mode="w:gz") as tar:
+            info = tarfile.TarInfo("bundle/nmk.yml")
+            info.size = len(project)
+            tar.addfile(info, io.BytesIO(project))
+        zip_buffer = io.BytesIO()
+        with ZipFile(zip_buffer, "w") as z:
+            z.writestr("bundle/nmk.yml", project)
+        archives = {"/bundle.tar.gz": tar_buffer.getvalue(), "/bundle.zip": zip_buffer.getvalue()}
+
+        # Local HTTP server for these archives
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = archives[self.path]
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            for archive in archives:
+                self.nmk(f"http://127.0.0.1:{server.server_address[1]}{archive}!bundle/nmk.yml", extra_args=["--print", "someInt"])
+                self.check_logs('"someInt": 12')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # Archives are extracted on the fly: no downloaded archive file in cache
+        assert not any(p.name.endswith((".zip", ".gz")) for p in (self.nmk_cache / "cache").iterdir())
+
+    def test_tar_invalid_path(self):
+        # Build tar with a member outside of target folder
+        tar_buffer = io.BytesIO()
+        with tarfile.open(fileobj=tar_buffer, mode="w") as tar:
+            info = tarfile.TarInfo("sub/../../evil.txt")
+            tar.addfile(info, io.BytesIO())
+        tar_buffer.seek(0)
+        target = self.test_folder / "extract"
+        with pytest.raises(AssertionError, match=re.escape("Invalid path in tar archive: sub/../../evil.txt")):
+            nmk._internal.cache.safe_tar_extract(tar_buffer, target)
+        assert not (self.test_folder / "evil.txt").exists()
+
     def test_malformed_pip_url(self):
         self.nmk("pip://foo/bar", expected_error="While loading pip://foo/bar: Malformed pip reference: pip://foo/bar")
 
@@ -129,6 +286,61 @@ class TestRefs(NmkTester):
         )
         assert found_args[1:] == ["-m", "pip", "install", "definitely-unknown-package>=1.2"]
 
+    def test_pip_install_batch(self, monkeypatch: MonkeyPatch):
+        found_args = []
+
+        def record_process(args: list[str], *p_args, **kwargs):  # pyright: ignore[reportUnknownParameterType, reportMissingParameterType]
+            found_args.append(args)
+            return subprocess.CompletedProcess(args, 0, "", "")
+
+        monkeypatch.setattr(subprocess, "run", record_process)  # pyright: ignore[reportUnknownArgumentType]
+        self.nmk(
+            "pip_refs_batch.yml",
+            expected_error="While loading pip://first-unknown-package>=1.0!foo.yml: Can't find module 'first_unknown_package' even after having installed 'first-unknown-package>=1.0' package",
+        )
+
+        # All missing packages are installed at once
+        install_args = [a[1:] for a in found_args if a[1:3] == ["-m", "pip"]]
+        assert install_args == [["-m", "pip", "install", "first-unknown-package>=1.0", "second-unknown-package"]]
+
+    def test_env_backend_on_demand(self, monkeypatch: MonkeyPatch):
+        # Record backend detections
+        detected = []
+
+        class FakeBackend:
+            def is_mutable(self) -> bool:
+                return False
+
+        def fake_detect(project_path: Path | None = None, verbose_subprocess: bool = True) -> FakeBackend:
+            detected.append(project_path)
+            return FakeBackend()
+
+        from nmk.envbackend import EnvBackendFactory
+
+        monkeypatch.setattr(EnvBackendFactory, "detect", fake_detect)
+
+        # No pip reference: backend is not needed
+        self.nmk("self_ref.yml")
+        assert detected == []
+
+        # Pip reference with missing package: backend is detected once, for project dir
+        project = self.prepare_project("pip_ref.yml")
+        self.nmk(project)
+        self.check_logs("Can't install plugins in this environment; just adding some-unknown-package to requirements and skip reference for now.")
+        assert detected == [self.test_folder.resolve()]
+
+        # Backend and pip args can still be provided
+        backend = FakeBackend()
+        model = NmkModel(Namespace())
+        model.env_backend = backend
+        assert model.env_backend is backend and model.pip_args == ""
+        model.pip_args = "--some-arg"
+        assert model.pip_args == "--some-arg"
+
+        # Provided backend is used for pip installs
+        assert nmk._internal.cache.pip_install("pip://some-unknown-package", lambda: model.env_backend) is None
+        assert detected == [self.test_folder.resolve()]
+
     def test_pip_ref_not_mutable(self, monkeypatch: MonkeyPatch):
         # Test a pip ref with a (faked) non-mutable backend
         try:
@@ -1,4 +1,9 @@
+import os
+
+import pytest
+
 from nmk._internal.completion import TasksCompleter
+from nmk._internal.loader import NmkLoader
 from nmk._internal.parser import NmkParser
 from tests.utils import NmkTester
 
@@ -8,14 +13,45 @@ class TestTasks(NmkTester):
         self.nmk("task_unknown_emoji.yml", expected_error="While loading {project}: No emoji called 'some_unknown_emoji'")
 
     def test_class_not_found(self):
-        self.nmk("task_class_not_found.yml", expected_error="While loading {project}: Can't instantiate class unknown.Builder: No module named 'unknown'")
+        self.nmk(
+            "task_class_not_found.yml",
+            extra_args=["--validate"],
+            expected_error="While loading {project}: Can't instantiate class unknown.Builder: No module named 'unknown'",
+        )
+
+        # Completion index is not written for a partially loaded model
+        assert not (self.nmk_cache / "completion").exists()
 
     def test_class_bad_type(self):
         self.nmk(
             "task_class_bad_type.yml",
+            extra_args=["--validate"],
             expected_error="While loading {project}: Unexpected type for loaded class tests.sample_resolvers.StrResolver: got StrResolver, expecting NmkTaskBuilder subclass",
         )
 
+    def test_class_lazy_loading(self):
+        # Builder class is not loaded as long as task is not built
+        self.nmk("task_class_not_found.yml")
+        self.check_logs("Nothing to do")
+
+        # Loading error is reported once task is about to be built
+        self.nmk(
+            "task_class_not_found.yml",
+            extra_args=["dummy"],
+            expected_error="While loading {project}: Can't instantiate class unknown.Builder: No module named 'unknown'",
+        )
+
+    def test_class_assigned_builder(self):
+        # Assigned builder replaces the one to be loaded on demand
+        model = NmkLoader(
+            NmkParser().parse(["--root", self.test_folder.as_posix(), "-p", self.template("task_class_not_found.yml").as_posix(), "--no-logs"])
+        ).model
+        task = model.tasks["dummy"]
+        assert task.has_builder
+        builder = object()
+        task.builder = builder
+        assert task.builder is builder
+
     def test_unknown_dep(self):
         self.nmk("task_unknown_dep.yml", expected_error="Can't find any of candidates (['someUnknownOtherTask']) referenced by someTask task")
 
@@ -36,3 +72,34 @@ class TestTasks(NmkTester):
         )
         assert len(tasks) == 5
         assert all(t in tasks for t in ["someTask", "contribB", "contribA", "prologue", "epilogue"])
+
+    def test_tasks_completion_index(self, monkeypatch: pytest.MonkeyPatch):
+        project = self.prepare_project("task_contributing_dep.yml")
+        args = ["--root", self.test_folder.as_posix(), "-p", project.as_posix()]
+        expected = ["someTask", "contribB", "contribA", "prologue", "epilogue"]
+
+        # First completion: model is loaded, and completion index is written
+        assert sorted(TasksCompleter()("", None, None, NmkParser().parse(args))) == sorted(expected)
+        assert len(list((self.nmk_cache / "completion").glob("*.json"))) == 1
+
+        # Next completion: index is used, model isn't loaded anymore
+        def no_loader(*args, **kwargs):
+            raise AssertionError("Model shouldn't be loaded")
+
+        monkeypatch.setattr("nmk._internal.loader.NmkLoader", no_loader)
+        assert sorted(TasksCompleter()("", None, None, NmkParser().parse(args))) == sorted(expected)
+
+        # Touch project file: index is outdated, model is loaded again
+        monkeypatch.undo()
+        st = project.stat()
+        os.utime(project, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        loads = []
+        original_init = NmkLoader.__init__
+        monkeypatch.setattr(NmkLoader, "__init__", lambda self, *a, **kw: loads.append(1) or original_init(self, *a, **kw))
+        assert sorted(TasksCompleter()("", None, None, NmkParser().parse(args))) == sorted(expected)
+        assert len(loads) == 1
+
+        # Successful build also refreshes the index
+        self.nmk(project, extra_args=["--dry-run"])
+        assert sorted(TasksCompleter()("", None, None, NmkParser().parse(args))) == sorted(expected)
+        assert len(loads) == 2
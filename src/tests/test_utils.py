@@ -1,6 +1,11 @@
+import asyncio
+import subprocess
 import sys
+import time
 
-from nmk.utils import create_dir_symlink, run_with_logs
+import pytest
+
+from nmk.utils import create_dir_symlink, run_all_with_logs, run_with_logs
 from tests.utils import NmkTester
 
 
@@ -22,3 +27,61 @@ class TestUtils(NmkTester):
         # Version check
         cp = run_with_logs([sys.executable, "--version"])
         assert cp.stdout.strip().startswith("Python 3")
+
+    def test_run_with_logs_stream(self):
+        # Lots of lines on both streams
+        script = "import sys\nfor i in range(5000):\n    print(f'out{i}')\n    print(f'err{i}', file=sys.stderr)\n"
+        cp = run_with_logs([sys.executable, "-c", script], stream=True, tail_lines=10)
+        assert cp.returncode == 0
+        assert cp.stdout.splitlines() == [f"out{i}" for i in range(4990, 5000)]
+        assert cp.stderr.splitlines() == [f"err{i}" for i in range(4990, 5000)]
+
+        # All lines were logged anyway
+        self.check_logs([">> stdout: out0", ">> stdout: out4999"], check_order=True)
+        self.check_logs([">> stderr: err0", ">> stderr: err4999"], check_order=True)
+
+    def test_run_with_logs_stream_error(self):
+        # Error message only holds last lines
+        script = "import sys\nfor i in range(100):\n    print(f'line{i}')\nsys.exit(3)\n"
+        with pytest.raises(AssertionError, match="command returned 3\nline97\nline98\nline99\n$"):
+            run_with_logs([sys.executable, "-c", script], stream=True, tail_lines=3)
+
+    def test_run_all_with_logs(self):
+        # Several commands, with limited concurrency
+        commands = [[sys.executable, "-c", f"import sys; print('out{i}'); print('err{i}', file=sys.stderr)"] for i in range(5)]
+        results = run_all_with_logs(commands, jobs=2)
+        assert [cp.stdout for cp in results] == [f"out{i}\n" for i in range(5)]
+        assert [cp.stderr for cp in results] == [f"err{i}\n" for i in range(5)]
+        self.check_logs(["[1/5] >> stdout: out0", "[5/5] >> stderr: err4"])
+
+    def test_run_all_with_logs_running_loop(self):
+        # Called from a running event loop: batch runs in a worker thread
+        async def from_loop() -> list[subprocess.CompletedProcess[str]]:
+            return run_all_with_logs([[sys.executable, "-c", "print('looped')"]], jobs=1)
+
+        assert [cp.stdout for cp in asyncio.run(from_loop())] == ["looped\n"]
+
+        # Errors are forwarded as well
+        async def failing_from_loop():
+            run_all_with_logs([[sys.executable, "-c", "import sys; sys.exit(3)"]], jobs=1)
+
+        with pytest.raises(AssertionError, match="command returned 3"):
+            asyncio.run(failing_from_loop())
+
+    def test_run_all_with_logs_fail_fast(self):
+        # Failing command stops the other ones
+        start = time.perf_counter()
+        with pytest.raises(AssertionError, match="command returned 2\nfailed\n$"):
+            run_all_with_logs(
+                [[sys.executable, "-c", "import time; time.sleep(60)"], [sys.executable, "-c", "import sys; print('failed'); sys.exit(2)"]], jobs=2
+            )
+        assert time.perf_counter() - start < 30
+
+    def test_run_all_with_logs_collect_errors(self):
+        # All commands are executed, and all errors are reported
+        commands = [[sys.executable, "-c", f"import sys; print('cmd{i}'); sys.exit({i % 2})"] for i in range(4)]
+        with pytest.raises(AssertionError, match="2/4 commands failed:\n\\[2/4\\] .*command returned 1\ncmd1\n\n\\[4/4\\] .*command returned 1\ncmd3\n$"):
+            run_all_with_logs(commands, fail_fast=False)
+
+        # Without check, results are just returned
+        assert [cp.returncode for cp in run_all_with_logs(commands, check=False, fail_fast=False)] == [0, 1, 0, 1]